@@ -0,0 +1,43 @@
+"""Times GET / on the web UI with cold and warm system-info caches.
+
+Usage: python3 benchmarks/bench_index.py [requests]
+
+"cold" clears the sysinfo caches before every request, which is what each
+page load cost before they existed. "warm" is the normal cached path.
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sysinfo
+from web_control import app
+
+def run(client, count, cold):
+    timings = []
+    for _ in range(count):
+        if cold:
+            sysinfo.clear_caches()
+        start = time.perf_counter()
+        response = client.get("/")
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return timings
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:5} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+          f"median {statistics.median(timings) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    client = app.test_client()
+    report("cold", run(client, count, cold=True))
+    client.get("/")  # Prime the caches
+    report("warm", run(client, count, cold=False))
+
+if __name__ == "__main__":
+    main()
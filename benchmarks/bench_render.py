@@ -0,0 +1,89 @@
+"""Render benchmarks for the clock against the simulated LCD backend.
+
+Usage: python3 benchmarks/bench_render.py [iterations]
+
+For draw_main, draw_menu, the backlight menu flow and a full main-loop
+step, reports per-call latency, HD44780 bytes and estimated I2C bytes
+per call, and the CPU time used. No hardware, network or /opt/piclock
+access is needed.
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hal import SimulatedBackend
+from main import Clock
+from buttons import ButtonEvent
+from weather import WeatherWorker
+from config_watch import ConfigWatcher
+from lcd_service import LcdService
+
+def make_clock(directory):
+    with open(os.path.join(directory, "location.txt"), "w") as f:
+        f.write("Toronto")
+    backend = SimulatedBackend()
+    config = ConfigWatcher(directory)
+    config.load()
+    weather = WeatherWorker(cache_path=os.path.join(directory, "weather_cache.json"),
+                            location_source=lambda: config.get("location.txt"))
+    # Skip the network; the benchmark only draws it
+    weather._entries = {"Toronto": {"text": "12.5C Partly cloudy", "temperature": 12.5, "code": 2}}
+    weather._locations = ("Toronto",)
+    lcd_service = LcdService(path=os.path.join(directory, "lcd.sock"))
+    return Clock(backend, config=config, weather=weather, lcd_service=lcd_service), backend
+
+def measure(label, backend, iterations, func):
+    timings = []
+    backend.reset_counters()
+    cpu_start = time.process_time()
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:22} mean {statistics.mean(timings) * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us   "
+          f"lcd {backend.lcd_bytes / iterations:6.1f} B/call   i2c {backend.i2c_bytes / iterations:7.1f} B/call   "
+          f"cpu {cpu * 1000:7.1f} ms")
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        clock, backend = make_clock(directory)
+        start_time = datetime.datetime(2024, 1, 1, 8, 0)
+        clock.draw_main(start_time)
+
+        # One new minute per frame, like the real clock face
+        measure("draw_main (new minute)", backend, iterations,
+                lambda i: clock.draw_main(start_time + datetime.timedelta(minutes=i + 1)))
+        same_time = start_time + datetime.timedelta(minutes=iterations)
+        measure("draw_main (unchanged)", backend, iterations, lambda i: clock.draw_main(same_time))
+
+        def menu_step(i):
+            clock.menu_index = i % 8
+            clock.draw_menu()
+        measure("draw_menu", backend, iterations, menu_step)
+
+        # select, down x3, right: open the menu, pick a color, apply it
+        flow = [("press", "select"), ("press", "down"), ("press", "down"), ("press", "down"), ("press", "right")]
+        def menu_flow(i):
+            for kind, button in flow:
+                clock.handle_button(ButtonEvent(kind, button, time.monotonic()))
+            clock.notice = None
+            clock.draw_main(same_time)
+        measure("backlight menu flow", backend, iterations, menu_flow)
+
+        # A full pass of the main loop woken by a posted event, without sleeping
+        def loop_step(i):
+            clock.scheduler.post()
+            clock.step()
+        measure("main loop step", backend, iterations, loop_step)
+
+if __name__ == "__main__":
+    main()
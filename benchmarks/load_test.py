@@ -0,0 +1,83 @@
+"""Load test for a running web_control server.
+
+Usage: python3 benchmarks/load_test.py [--url http://127.0.0.1:8080] [--clients 8] [--requests 200]
+
+Each client thread keeps one HTTP/1.1 connection open and sends its share of
+requests for every scenario in turn. Prints requests/sec and latency
+percentiles per scenario. The POST scenarios really save a message and
+backlight color, so point it at a test instance rather than a clock in use.
+"""
+import sys
+import time
+import argparse
+import threading
+import http.client
+import statistics
+from urllib.parse import urlsplit, urlencode
+
+SCENARIOS = [
+    ("GET /", "GET", "/", None),
+    ("GET /api/status", "GET", "/api/status", None),
+    ("POST / message", "POST", "/", {"message": "Load test"}),
+    ("POST / color", "POST", "/", {"color": "White"}),
+]
+
+def client(host, port, method, path, form, count, timings, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    body = urlencode(form) if form else None
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if form else {}
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        timings.append(time.perf_counter() - start)
+    conn.close()
+
+def run(host, port, scenario, clients, total):
+    label, method, path, form = scenario
+    timings = []
+    errors = []
+    per_client = max(1, total // clients)
+    threads = [
+        threading.Thread(target=client, args=(host, port, method, path, form, per_client, timings, errors))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if not timings:
+        print(f"{label:18} all {len(errors)} requests failed: {errors[:3]}")
+        return
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:18} {len(timings) / elapsed:8.1f} req/s   "
+          f"p50 {statistics.median(timings) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms   errors {len(errors)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    if not url.hostname:
+        sys.exit(f"Invalid URL: {args.url}")
+    for scenario in SCENARIOS:
+        run(url.hostname, url.port or 80, scenario, args.clients, args.requests)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import time
+import threading
+from collections import namedtuple
+
+POLL_INTERVAL = 0.02  # While a button is down or settling
+IDLE_POLL_INTERVAL = 0.1  # While nothing is pressed; short enough not to miss a quick tap
+DEBOUNCE_TIME = 0.03  # A new state must hold this long before it counts
+LONG_PRESS = 1.0
+REPEAT_DELAY = 0.5
+REPEAT_INTERVAL = 0.15
+REPEAT_BUTTONS = ("up", "down")
+
+# kind is "press", "release", "long" or "repeat"
+ButtonEvent = namedtuple("ButtonEvent", ["kind", "button", "timestamp"])
+
+class ButtonReader(threading.Thread):
+    """Polls the backend's buttons on its own thread and queues debounced events."""
+
+    def __init__(self, backend, events):
+        super().__init__(name="buttons", daemon=True)
+        self.backend = backend
+        self.events = events
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _emit(self, kind, button, now):
+        self.events.put(ButtonEvent(kind, button, now))
+
+    def run(self):
+        stable = set()  # Debounced state
+        candidate = set()  # Raw state waiting out the debounce time
+        candidate_since = 0
+        pressed_at = {}
+        long_sent = set()
+        next_repeat = {}
+
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            try:
+                raw = self.backend.read_buttons()
+            except Exception as e:
+                print(f"Error reading buttons: {e}")
+                self._stopping.wait(1)
+                continue
+
+            if raw != candidate:
+                candidate = raw
+                candidate_since = now
+            elif candidate != stable and now - candidate_since >= DEBOUNCE_TIME:
+                for button in candidate - stable:
+                    pressed_at[button] = now
+                    next_repeat[button] = now + REPEAT_DELAY
+                    self._emit("press", button, now)
+                for button in stable - candidate:
+                    pressed_at.pop(button, None)
+                    next_repeat.pop(button, None)
+                    long_sent.discard(button)
+                    self._emit("release", button, now)
+                stable = set(candidate)
+
+            for button in stable:
+                if button not in long_sent and now - pressed_at[button] >= LONG_PRESS:
+                    long_sent.add(button)
+                    self._emit("long", button, now)
+                if button in REPEAT_BUTTONS and now >= next_repeat[button]:
+                    next_repeat[button] = now + REPEAT_INTERVAL
+                    self._emit("repeat", button, now)
+
+            busy = stable or candidate != stable
+            self._stopping.wait(POLL_INTERVAL if busy else IDLE_POLL_INTERVAL)
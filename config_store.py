@@ -0,0 +1,121 @@
+import os
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+
+CONFIG_DIR = "/opt/piclock"
+CONFIG_FILES = ("msg.txt", "location.txt", "backlight.txt", "scroll_speed.txt")
+VERSION_FILE = "config_version"
+LOCK_FILE = ".config.lock"
+
+def atomic_write(path, text):
+    """Replaces path with text so readers see either the old or the new file, never half of one."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def read_file(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except:
+        return None
+
+class ConfigStore:
+    """Shared access to the config files in /opt/piclock.
+
+    Writes go through transaction(), which applies every change atomically
+    and then bumps a version counter once. Readers compare the counter to
+    skip re-reading files that haven't changed. A thread lock and a lock
+    file serialize writers within and across processes.
+    """
+
+    def __init__(self, directory=CONFIG_DIR, files=CONFIG_FILES):
+        self.directory = directory
+        self.files = tuple(files)
+        self._lock = threading.Lock()
+        self._cache = (None, {})  # (version, snapshot)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def version(self):
+        try:
+            return int(read_file(self.path(VERSION_FILE)) or 0)
+        except ValueError:
+            return 0
+
+    def read(self, name):
+        return read_file(self.path(name))
+
+    def snapshot(self):
+        # Returns all config values, re-reading the files only when the version has moved
+        version = self.version()
+        with self._lock:
+            if self._cache[0] == version:
+                return dict(self._cache[1])
+        values = {name: self.read(name) for name in self.files}
+        with self._lock:
+            self._cache = (version, values)
+        return dict(values)
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        """Collects changes in a dict and writes them together on exit.
+
+        Set a name to a string to write it or to None to remove the file.
+        Nothing is written if the block raises.
+        """
+        changes = {}
+        yield changes
+        if not changes:
+            return
+        with self._exclusive():
+            for name, value in changes.items():
+                if value is None:
+                    try:
+                        os.remove(self.path(name))
+                    except FileNotFoundError:
+                        pass
+                else:
+                    atomic_write(self.path(name), value)
+            atomic_write(self.path(VERSION_FILE), str(self.version() + 1))
+
+    def write(self, name, value):
+        with self.transaction() as changes:
+            changes[name] = value
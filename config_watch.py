@@ -0,0 +1,127 @@
+import os
+import time
+import struct
+import ctypes
+import ctypes.util
+import threading
+from config_store import CONFIG_DIR, CONFIG_FILES, read_file
+
+POLL_INTERVAL = 2  # Seconds between mtime checks when inotify is unavailable
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVED_FROM = 0x00000040
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MOVED_FROM
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+def open_inotify(directory):
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, f"inotify_add_watch failed for {directory}")
+    return fd
+
+class ConfigWatcher(threading.Thread):
+    """In-memory snapshot of the files the web UI edits.
+
+    Files are read once by load() and again only when inotify reports a
+    change in the config directory. Where inotify isn't available the
+    thread falls back to comparing mtimes every POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, directory=CONFIG_DIR, files=CONFIG_FILES, on_change=None):
+        super().__init__(name="config-watch", daemon=True)
+        self.directory = directory
+        self.files = tuple(files)
+        self.on_change = on_change
+        self.changed = threading.Event()  # Set whenever any watched file changes
+        self.loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._values = {name: None for name in self.files}
+        self._stamps = {name: None for name in self.files}
+
+    def load(self):
+        # Initial read of every file; run() does this itself if it hasn't happened yet
+        values = {name: read_file(self._path(name)) for name in self.files}
+        stamps = {name: self._stat(name) for name in self.files}
+        with self._lock:
+            self._values = values
+            self._stamps = stamps
+        self.loaded.set()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _stat(self, name):
+        try:
+            st = os.stat(self._path(name))
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def get(self, name):
+        with self._lock:
+            return self._values.get(name)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _reload(self, name):
+        value = read_file(self._path(name))
+        with self._lock:
+            if value == self._values.get(name):
+                return
+            self._values[name] = value
+        self.changed.set()
+        if self.on_change:
+            try:
+                self.on_change(name, value)
+            except Exception as e:
+                print(f"Error handling change to {name}: {e}")
+
+    def _watch_inotify(self, fd):
+        while True:
+            data = os.read(fd, 4096)
+            names = set()
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                if name in self.files:
+                    names.add(name)
+            for name in names:
+                self._reload(name)
+
+    def _watch_polling(self):
+        while True:
+            time.sleep(POLL_INTERVAL)
+            for name in self.files:
+                stamp = self._stat(name)
+                if stamp != self._stamps[name]:
+                    self._stamps[name] = stamp
+                    self._reload(name)
+
+    def run(self):
+        if not self.loaded.is_set():
+            self.load()
+        try:
+            fd = open_inotify(self.directory)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling {self.directory} instead")
+            self._watch_polling()
+            return
+        # Catch anything written between the initial read and the watch starting
+        for name in self.files:
+            self._reload(name)
+        self._watch_inotify(fd)
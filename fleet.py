@@ -0,0 +1,241 @@
+"""Push the same settings to many PiClocks at once.
+
+Usage:
+    python3 fleet.py --hosts kitchen.local bedroom.local:8080 --message "Dinner at 6" --color Blue
+    python3 fleet.py --hosts-file clocks.txt --timezone America/Toronto --ntp-server pool.ntp.org
+
+Each clock gets the same form posts its web UI sends, so the usual
+validation and behaviour apply. Clocks are updated concurrently; the
+changes for a single clock are applied in order.
+"""
+import sys
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit, urlencode
+
+DEFAULT_PORT = 8080
+DEFAULT_TIMEOUT = 10  # Per request
+DEFAULT_RETRIES = 2
+JOB_POLL_INTERVAL = 0.5
+JOB_TIMEOUT = 60  # How long to wait for a timezone/NTP job to finish
+
+class FleetError(Exception):
+    pass
+
+class RetryableError(FleetError):
+    """Connection problems, timeouts and 5xx responses."""
+
+def parse_endpoint(endpoint):
+    if "://" not in endpoint:
+        endpoint = f"http://{endpoint}"
+    url = urlsplit(endpoint)
+    if url.scheme != "http" or not url.hostname:
+        raise ValueError(f"Unsupported clock endpoint: {endpoint}")
+    return url.hostname, url.port or DEFAULT_PORT
+
+async def http_request(host, port, method, path, form=None, timeout=DEFAULT_TIMEOUT):
+    """Minimal HTTP/1.1 client returning (status, parsed JSON body or None)."""
+    body = urlencode(form).encode() if form else b""
+    head = (
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Accept: application/json\r\n"
+        "Connection: close\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    )
+    if form:
+        head += "Content-Type: application/x-www-form-urlencoded\r\n"
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(head.encode() + b"\r\n" + body)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    try:
+        raw = await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        raise RetryableError(f"timed out after {timeout}s")
+    except OSError as e:
+        raise RetryableError(str(e))
+
+    header_block, _, payload = raw.partition(b"\r\n\r\n")
+    try:
+        status = int(header_block.split(b"\r\n", 1)[0].split()[1])
+    except (IndexError, ValueError):
+        raise RetryableError("malformed response")
+    if b"transfer-encoding: chunked" in header_block.lower():
+        payload = _dechunk(payload)
+    try:
+        data = json.loads(payload) if payload else None
+    except ValueError:
+        data = None
+    if status >= 500:
+        raise RetryableError(f"HTTP {status}")
+    return status, data
+
+def _dechunk(payload):
+    body = b""
+    while payload:
+        size_line, _, payload = payload.partition(b"\r\n")
+        size = int(size_line.split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        body += payload[:size]
+        payload = payload[size + 2:]
+    return body
+
+def build_steps(changes):
+    """Turns the requested changes into (description, path, form) posts, mirroring the web UI forms."""
+    steps = []
+    if changes.get("clear_message"):
+        steps.append(("clear message", "/", {"clear": "true"}))
+    display = {}
+    if changes.get("message") is not None:
+        display["message"] = changes["message"]
+    if changes.get("location") is not None:
+        display["location"] = changes["location"]
+    if display:
+        steps.append(("display", "/", display))
+    if changes.get("color"):
+        steps.append(("color", "/", {"color": changes["color"]}))
+    if changes.get("timezone"):
+        steps.append(("timezone", "/set_timezone", {"timezone": changes["timezone"]}))
+    if changes.get("ntp_server") is not None:
+        steps.append(("ntp server", "/set_ntp_server", {"ntp_server": changes["ntp_server"]}))
+    if changes.get("sync_ntp"):
+        steps.append(("ntp sync", "/sync_ntp", {}))
+    return steps
+
+async def with_retries(retries, func, *args, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            return await func(*args, **kwargs)
+        except RetryableError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+async def wait_for_job(host, port, job_id, timeout, retries):
+    deadline = asyncio.get_running_loop().time() + JOB_TIMEOUT
+    while True:
+        _, job = await with_retries(retries, http_request, host, port, "GET", f"/jobs/{job_id}", timeout=timeout)
+        if job and job.get("status") in ("done", "failed"):
+            return job
+        if asyncio.get_running_loop().time() >= deadline:
+            raise FleetError(f"job {job_id} still {job.get('status') if job else 'unknown'} after {JOB_TIMEOUT}s")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+async def apply_step(host, port, step, timeout, retries):
+    description, path, form = step
+    status, data = await with_retries(retries, http_request, host, port, "POST", path, form, timeout=timeout)
+    if status == 202 and data and "id" in data:
+        job = await wait_for_job(host, port, data["id"], timeout, retries)
+        if job["status"] == "failed":
+            raise FleetError(job.get("message") or "job failed")
+        return job.get("message", "")
+    if status >= 400 or not data:
+        detail = (data or {}).get("error") or "; ".join((data or {}).get("messages", [])) or f"HTTP {status}"
+        raise FleetError(detail)
+    return "; ".join(data.get("messages", []))
+
+async def apply_to_clock(endpoint, steps, timeout, retries):
+    result = {"endpoint": endpoint, "ok": True, "steps": []}
+    try:
+        host, port = parse_endpoint(endpoint)
+    except ValueError as e:
+        result.update(ok=False, error=str(e))
+        return result
+    for step in steps:
+        try:
+            detail = await apply_step(host, port, step, timeout, retries)
+            result["steps"].append({"step": step[0], "ok": True, "detail": detail})
+        except FleetError as e:
+            result["steps"].append({"step": step[0], "ok": False, "detail": str(e)})
+            result["ok"] = False
+            if isinstance(e, RetryableError):
+                break  # The clock is unreachable; skip its remaining steps
+        except Exception as e:
+            # Anything unexpected, like a garbled reply, fails this clock but not the whole run
+            result["steps"].append({"step": step[0], "ok": False, "detail": f"{type(e).__name__}: {e}"})
+            result["ok"] = False
+            break
+    return result
+
+async def apply_to_fleet(endpoints, changes, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, concurrency=16):
+    steps = build_steps(changes)
+    if not steps:
+        raise ValueError("No changes requested")
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(endpoint):
+        async with limit:
+            return await apply_to_clock(endpoint, steps, timeout, retries)
+
+    return await asyncio.gather(*(run(endpoint) for endpoint in endpoints))
+
+def push(endpoints, changes, **options):
+    """Synchronous wrapper around apply_to_fleet()."""
+    return asyncio.run(apply_to_fleet(endpoints, changes, **options))
+
+def print_summary(results):
+    for result in results:
+        print(f"{'OK    ' if result['ok'] else 'FAILED'} {result['endpoint']}")
+        if result.get("error"):
+            print(f"         {result['error']}")
+        for step in result["steps"]:
+            mark = "ok" if step["ok"] else "FAILED"
+            print(f"         {step['step']}: {mark}{' - ' + step['detail'] if step['detail'] else ''}")
+    succeeded = sum(1 for result in results if result["ok"])
+    print(f"{succeeded}/{len(results)} clocks updated")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Push settings to several PiClocks concurrently")
+    parser.add_argument("--hosts", nargs="*", default=[], help="Clock endpoints, e.g. kitchen.local or 10.0.0.5:8080")
+    parser.add_argument("--hosts-file", help="File with one endpoint per line")
+    parser.add_argument("--message")
+    parser.add_argument("--clear-message", action="store_true")
+    parser.add_argument("--color")
+    parser.add_argument("--location")
+    parser.add_argument("--timezone")
+    parser.add_argument("--ntp-server")
+    parser.add_argument("--sync-ntp", action="store_true")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    endpoints = list(args.hosts)
+    if args.hosts_file:
+        with open(args.hosts_file, "r") as f:
+            endpoints += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not endpoints:
+        parser.error("no clocks given; use --hosts or --hosts-file")
+
+    changes = {
+        "message": args.message,
+        "clear_message": args.clear_message,
+        "color": args.color,
+        "location": args.location,
+        "timezone": args.timezone,
+        "ntp_server": args.ntp_server,
+        "sync_ntp": args.sync_ntp
+    }
+    try:
+        results = push(endpoints, changes, timeout=args.timeout, retries=args.retries, concurrency=args.concurrency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_summary(results)
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+
+CGRAM_SLOTS = 8
+
+# 5x8 bitmaps, one row per byte (low five bits used)
+GLYPHS = {
+    "sun": (0b00000, 0b10101, 0b01110, 0b11011, 0b01110, 0b10101, 0b00000, 0b00000),
+    "cloud": (0b00000, 0b00000, 0b01100, 0b10010, 0b10001, 0b11111, 0b00000, 0b00000),
+    "rain": (0b01100, 0b10010, 0b11111, 0b00000, 0b01010, 0b10100, 0b01010, 0b00000),
+    "snow": (0b00000, 0b10101, 0b01110, 0b11111, 0b01110, 0b10101, 0b00000, 0b00000),
+    "storm": (0b01100, 0b10010, 0b11111, 0b00100, 0b01000, 0b11100, 0b00100, 0b01000),
+    "fog": (0b00000, 0b11111, 0b00000, 0b11111, 0b00000, 0b11111, 0b00000, 0b00000),
+    "degree": (0b01100, 0b10010, 0b10010, 0b01100, 0b00000, 0b00000, 0b00000, 0b00000),
+}
+
+# Shown instead of a glyph when every slot is taken by glyphs already on screen
+FALLBACKS = {
+    "sun": "*",
+    "cloud": "~",
+    "rain": "'",
+    "snow": "*",
+    "storm": "!",
+    "fog": "=",
+    "degree": "",
+}
+
+class GlyphCache:
+    """Tracks which custom glyph sits in which of the HD44780's CGRAM slots.
+
+    char() returns the character that draws a glyph, uploading it only if it
+    isn't already resident. When the slots are full the least recently used
+    glyph is evicted, skipping any used since the last begin_frame(): those
+    may be on screen, and replacing a slot redraws every cell showing it.
+    """
+
+    def __init__(self, backend, slots=CGRAM_SLOTS, on_upload=None):
+        self.backend = backend
+        self.slots = slots
+        self.on_upload = on_upload  # Uploads move the LCD's address counter; the renderer must re-seek
+        self.uploads = 0
+        self.hits = 0
+        self._resident = OrderedDict()  # name -> slot, least recently used first
+        self._pinned = set()
+
+    def begin_frame(self):
+        self._pinned.clear()
+
+    def char(self, name):
+        slot = self._resident.get(name)
+        if slot is not None:
+            self._resident.move_to_end(name)
+            self._pinned.add(name)
+            self.hits += 1
+            return chr(slot)
+
+        slot = self._free_slot()
+        if slot is None:
+            return FALLBACKS.get(name, "?")
+        self.backend.create_char(slot, list(GLYPHS[name]))
+        self.uploads += 1
+        if self.on_upload:
+            self.on_upload()
+        self._resident[name] = slot
+        self._pinned.add(name)
+        return chr(slot)
+
+    def _free_slot(self):
+        used = set(self._resident.values())
+        for slot in range(self.slots):
+            if slot not in used:
+                return slot
+        for name in self._resident:
+            if name not in self._pinned:
+                return self._resident.pop(name)
+        return None
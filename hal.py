@@ -0,0 +1,175 @@
+import os
+import threading
+
+BUTTONS = {
+    "select": 0,
+    "right": 1,
+    "down": 2,
+    "up": 3,
+    "left": 4
+}
+
+# Rough I2C traffic through the plate's MCP23017, for comparing render paths.
+# Each HD44780 byte is sent as two nibbles with enable pulses: about nine GPIO
+# register writes of four bytes each. A backlight change is three pin writes
+# and a button scan is one two-register read.
+I2C_BYTES_PER_LCD_BYTE = 36
+I2C_BYTES_PER_COLOR = 12
+I2C_BYTES_PER_BUTTON_READ = 5
+
+class LcdBackend:
+    """What the clock needs from a 16x2 character display with five buttons."""
+
+    cols = 16
+    rows = 2
+
+    def clear(self):
+        raise NotImplementedError
+
+    def set_cursor(self, col, row):
+        raise NotImplementedError
+
+    def message(self, text):
+        raise NotImplementedError
+
+    def set_color(self, red, green, blue):
+        raise NotImplementedError
+
+    def create_char(self, slot, bitmap):
+        raise NotImplementedError
+
+    def read_buttons(self):
+        """Returns the set of button names currently held down."""
+        raise NotImplementedError
+
+class AdafruitBackend(LcdBackend):
+    """The Adafruit RGB Character LCD Plate on a real Pi.
+
+    The display, backlight and buttons all go through one MCP23017 whose
+    driver keeps a cached copy of the GPIO state. Button reads happen on
+    their own thread, so every call takes a lock to keep them from
+    interleaving with a half-written LCD byte.
+    """
+
+    def __init__(self):
+        from Adafruit_CharLCD import Adafruit_CharLCDPlate
+        self.lcd = Adafruit_CharLCDPlate()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.lcd.clear()
+
+    def set_cursor(self, col, row):
+        with self._lock:
+            self.lcd.set_cursor(col, row)
+
+    def message(self, text):
+        with self._lock:
+            self.lcd.message(text)
+
+    def set_color(self, red, green, blue):
+        with self._lock:
+            self.lcd.set_color(red, green, blue)
+
+    def create_char(self, slot, bitmap):
+        with self._lock:
+            self.lcd.create_char(slot, bitmap)
+
+    def read_buttons(self):
+        # All five buttons sit on the expander's port A and are active low,
+        # so one register read covers them. Falls back to one is_pressed()
+        # call per button on library versions that don't expose the expander.
+        names = list(BUTTONS)
+        pins = [BUTTONS[name] for name in names]
+        mcp = getattr(self.lcd, "_mcp", None)
+        with self._lock:
+            if mcp is not None and hasattr(mcp, "input_pins"):
+                levels = mcp.input_pins(pins)
+                return {name for name, level in zip(names, levels) if not level}
+            return {name for name, pin in zip(names, pins) if self.lcd.is_pressed(pin)}
+
+class SimulatedBackend(LcdBackend):
+    """In-memory display for tests, benchmarks and running off the Pi.
+
+    Every call is appended to writes, the screen contents are kept in
+    screen, and button presses are scripted with press()/release().
+    """
+
+    def __init__(self, cols=16, rows=2):
+        self.cols = cols
+        self.rows = rows
+        self.writes = []
+        self.lcd_bytes = 0
+        self.i2c_bytes = 0
+        self.color = (1.0, 1.0, 1.0)
+        self.cgram = {}
+        self.pressed = set()
+        self._cursor = (0, 0)
+        self.screen = [[" "] * cols for _ in range(rows)]
+
+    def _sent(self, lcd_bytes):
+        self.lcd_bytes += lcd_bytes
+        self.i2c_bytes += lcd_bytes * I2C_BYTES_PER_LCD_BYTE
+
+    def reset_counters(self):
+        self.writes = []
+        self.lcd_bytes = 0
+        self.i2c_bytes = 0
+
+    def clear(self):
+        self.writes.append(("clear",))
+        self._sent(1)
+        self.screen = [[" "] * self.cols for _ in range(self.rows)]
+        self._cursor = (0, 0)
+
+    def set_cursor(self, col, row):
+        self.writes.append(("cursor", col, row))
+        self._sent(1)
+        self._cursor = (col, row)
+
+    def message(self, text):
+        self.writes.append(("message", text))
+        col, row = self._cursor
+        for char in text:
+            if char == "\n":
+                col, row = 0, row + 1
+                self._sent(1)  # The library moves the cursor for a newline
+                continue
+            if row < self.rows and col < self.cols:
+                self.screen[row][col] = char
+            col += 1
+            self._sent(1)
+        self._cursor = (col, row)
+
+    def set_color(self, red, green, blue):
+        self.writes.append(("color", (red, green, blue)))
+        self.i2c_bytes += I2C_BYTES_PER_COLOR
+        self.color = (red, green, blue)
+
+    def create_char(self, slot, bitmap):
+        self.writes.append(("create_char", slot, tuple(bitmap)))
+        self._sent(1 + len(bitmap))
+        self.cgram[slot] = tuple(bitmap)
+
+    def read_buttons(self):
+        self.i2c_bytes += I2C_BYTES_PER_BUTTON_READ
+        return set(self.pressed)
+
+    def press(self, button):
+        self.pressed.add(button)
+
+    def release(self, button):
+        self.pressed.discard(button)
+
+    def text(self):
+        return ["".join(row) for row in self.screen]
+
+def get_backend(name=None):
+    """Builds the backend named by name or $PICLOCK_BACKEND ("adafruit" by default, or "sim")."""
+    name = name or os.environ.get("PICLOCK_BACKEND", "adafruit")
+    if name == "adafruit":
+        return AdafruitBackend()
+    if name in ("sim", "simulated"):
+        return SimulatedBackend()
+    raise ValueError(f"Unknown LCD backend: {name}")
@@ -0,0 +1,107 @@
+import time
+import uuid
+import queue
+import threading
+
+MAX_FINISHED_JOBS = 50  # Finished jobs kept around for the status endpoint
+
+class JobError(Exception):
+    """Raised by a job function to fail with a user-facing message."""
+
+class Job:
+    def __init__(self, key, name, func, args):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.name = name
+        self.func = func
+        self.args = args
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = ""
+        self.message = ""
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def report(self, progress):
+        # Called by the job function to describe the step it is on
+        self.progress = progress
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished
+        }
+
+class JobRunner:
+    """Runs slow privileged operations one at a time on a background thread.
+
+    Jobs are submitted with a key. A job submitted while another with the
+    same key is still waiting to start is merged into it: the waiting job
+    takes the newest arguments and its ID is returned again. So three
+    clicks on "Sync NTP" run at most one restart after the current one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._waiting = {}  # key -> queued job
+        self._thread = None
+
+    def submit(self, key, name, func, *args):
+        with self._lock:
+            job = self._waiting.get(key)
+            if job:
+                job.func = func
+                job.args = args
+                return job
+            job = Job(key, name, func, args)
+            self._jobs[job.id] = job
+            self._waiting[key] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="jobs", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self, limit=5):
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.submitted, reverse=True)
+        return jobs[:limit]
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        finished.sort(key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._waiting.pop(job.key, None)
+                job.status = "running"
+                job.started = time.time()
+            try:
+                job.message = job.func(job, *job.args) or ""
+                job.status = "done"
+            except JobError as e:
+                job.message = str(e)
+                job.status = "failed"
+            except Exception as e:
+                job.message = f"Unexpected error: {e}"
+                job.status = "failed"
+                print(f"Error in job {job.name}: {e}")
+            with self._lock:
+                job.finished = time.time()
+                self._prune()
@@ -0,0 +1,74 @@
+LCD_COLS = 16
+LCD_ROWS = 2
+
+class FrameRenderer:
+    """Draws 16x2 frames by rewriting only the cells that changed.
+
+    The renderer remembers what is on the display and, for each new frame,
+    moves the cursor to every run of changed characters and writes just
+    those. Every cursor move and character is one byte sent to the HD44780,
+    which is what bytes_written counts.
+    """
+
+    def __init__(self, lcd, cols=LCD_COLS, rows=LCD_ROWS):
+        self.lcd = lcd
+        self.cols = cols
+        self.rows = rows
+        self.frames = 0
+        self.bytes_written = 0  # Total since startup
+        self.last_frame_bytes = 0
+        self._shown = None  # None means the display contents are unknown
+        self._cursor = None
+
+    def invalidate(self):
+        # Call after anything else has written to the display
+        self._shown = None
+        self._cursor = None
+
+    def forget_cursor(self):
+        # Call after anything that moves the LCD's address counter, like a CGRAM upload
+        self._cursor = None
+
+    def _fit(self, lines):
+        lines = list(lines)[:self.rows]
+        lines += [""] * (self.rows - len(lines))
+        return [line[:self.cols].ljust(self.cols) for line in lines]
+
+    def _changed_runs(self, old, new):
+        # Neighbouring runs separated by a single unchanged cell are merged,
+        # since rewriting that cell costs the same byte as a cursor move.
+        runs = []
+        col = 0
+        while col < self.cols:
+            if old[col] == new[col]:
+                col += 1
+                continue
+            start = col
+            while col < self.cols and (old[col] != new[col] or (col + 1 < self.cols and old[col + 1] != new[col + 1])):
+                col += 1
+            runs.append((start, new[start:col]))
+        return runs
+
+    def render(self, *lines):
+        frame = self._fit(lines)
+        sent = 0
+        if self._shown is None:
+            self.lcd.clear()
+            self._shown = [" " * self.cols] * self.rows
+            self._cursor = (0, 0)
+            sent += 1
+
+        for row in range(self.rows):
+            for col, text in self._changed_runs(self._shown[row], frame[row]):
+                if self._cursor != (col, row):
+                    self.lcd.set_cursor(col, row)
+                    sent += 1
+                self.lcd.message(text)
+                sent += len(text)
+                self._cursor = (col + len(text), row)
+            self._shown[row] = frame[row]
+
+        self.frames += 1
+        self.bytes_written += sent
+        self.last_frame_bytes = sent
+        return sent
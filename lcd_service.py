@@ -0,0 +1,113 @@
+import os
+import json
+import socket
+import threading
+import socketserver
+
+SOCKET_PATH = "/opt/piclock/lcd.sock"
+CLIENT_TIMEOUT = 2
+MAX_NOTICE_LINES = 2
+MAX_NOTICE_SECONDS = 60
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            try:
+                command = json.loads(raw)
+                query = self.server.service.queries.get(command.get("cmd")) if isinstance(command, dict) else None
+                if query:
+                    # Answered right here on the socket thread; the main loop isn't involved
+                    reply = {"ok": True, "result": query()}
+                else:
+                    self.server.service.submit(command)
+                    reply = {"ok": True}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class LcdService:
+    """Accepts display commands from other processes over a Unix socket.
+
+    The clock process is the only one that touches the LCD. Commands are
+    queued here and applied by the main loop through take(), so hardware
+    access stays on one thread. Commands of the same kind are coalesced:
+    if several arrive before the main loop gets to them, only the latest
+    one is applied.
+
+    Queries registered in queries are read-only requests, like "metrics",
+    that are answered immediately instead of being queued.
+    """
+
+    COMMANDS = ("color", "notice")
+
+    def __init__(self, path=SOCKET_PATH, on_pending=None):
+        self.path = path
+        self.on_pending = on_pending  # Called on the socket thread after each command is queued
+        self.queries = {}  # name -> callable returning a JSON-serializable reply
+        self.pending_event = threading.Event()  # Set when there is something to take()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._server = None
+
+    def _validate(self, command):
+        # Checked here, on the socket thread, so the main loop only ever sees well-formed commands
+        kind = command.get("cmd")
+        if kind not in self.COMMANDS:
+            raise ValueError(f"Unknown command: {kind!r}")
+        if kind == "color":
+            if not isinstance(command.get("name"), str):
+                raise ValueError("color needs a string 'name'")
+        elif kind == "notice":
+            lines = command.get("lines")
+            if not isinstance(lines, list) or len(lines) > MAX_NOTICE_LINES or not all(isinstance(line, str) for line in lines):
+                raise ValueError(f"notice needs 'lines' as a list of at most {MAX_NOTICE_LINES} strings")
+            seconds = command.get("seconds")
+            if seconds is not None and (isinstance(seconds, bool) or not isinstance(seconds, (int, float))
+                                        or not 0 < seconds <= MAX_NOTICE_SECONDS):
+                raise ValueError(f"notice 'seconds' must be a number between 0 and {MAX_NOTICE_SECONDS}")
+
+    def submit(self, command):
+        if not isinstance(command, dict):
+            raise ValueError("Commands must be JSON objects")
+        self._validate(command)
+        kind = command["cmd"]
+        with self._lock:
+            self._pending[kind] = command
+        self.pending_event.set()
+        if self.on_pending:
+            self.on_pending()
+
+    def take(self):
+        # Called from the main loop; returns the coalesced commands in arrival order
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self.pending_event.clear()
+        return pending
+
+    def start(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._server = _Server(self.path, _CommandHandler)
+        self._server.service = self
+        threading.Thread(target=self._server.serve_forever, name="lcd-service", daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def send_command(cmd, path=SOCKET_PATH, timeout=CLIENT_TIMEOUT, **fields):
+    """Sends one command to the clock process and returns its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((json.dumps(dict(fields, cmd=cmd)) + "\n").encode())
+        with sock.makefile("rb") as reply:
+            return json.loads(reply.readline() or b"{}")
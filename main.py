@@ -1,9 +1,19 @@
-import os
-import json
 import time
+BOOT_STARTED = time.monotonic()  # Taken before the other imports so boot timing includes them
+
+import argparse
 import datetime
-import requests
-from Adafruit_CharLCD import Adafruit_CharLCDPlate
+import threading
+from hal import get_backend
+from weather import WeatherWorker, geocode_stats, location_label, weather_icon, weather_summary
+from config_watch import ConfigWatcher
+from lcd_render import FrameRenderer
+from lcd_service import LcdService
+from buttons import ButtonReader, ButtonEvent
+from scheduler import Scheduler
+from marquee import Marquee, parse_scroll_speed
+from glyphs import GlyphCache
+from metrics import Metrics
 
 COLORS = [
     ("Red", (1.0, 0.0, 0.0)),
@@ -16,199 +26,284 @@ COLORS = [
     ("Off", (0.0, 0.0, 0.0))
 ]
 
-COLOR_PATH = "/opt/piclock/backlight.txt"
-last_color_name = None  # Will track what color is currently applied
 COLORS_DICT = dict(COLORS)
 
-# Setup LCD
-lcd = Adafruit_CharLCDPlate()
-lcd.set_color(1.0, 1.0, 1.0)  # Default white
-lcd.clear()
-
-# Try restoring saved color
-try:
-    COLORS_DICT = dict(COLORS)  # Convert to dictionary
-    with open("/opt/piclock/backlight.txt", "r") as f:
-        name = f.read().strip()
-        if name in COLORS_DICT:
-            lcd.set_color(*COLORS_DICT[name])
-except Exception as e:
-    print(f"Backlight restore failed: {e}")
-
-# Constants
-BUTTONS = {
-    "select": 0,
-    "right": 1,
-    "down": 2,
-    "up": 3,
-    "left": 4
-}
-
-menu_index = 0
-in_menu = False
-
-# Utility functions
-def get_custom_message(path="/opt/piclock/msg.txt"):
-    try:
-        with open(path, "r") as f:
-            return f.read().strip()
-    except:
-        return None
-
-def get_location(path="/opt/piclock/location.txt"):
-    try:
-        with open(path, "r") as f:
-            return f.read().strip()
-    except:
-        return None
-
-def weather_summary(code):
-    return {
-        0: "Clear",
-        1: "Mainly clr",
-        2: "Partly cldy",
-        3: "Overcast",
-        45: "Fog",
-        48: "Fog",
-        51: "Drizzle",
-        53: "Drizzle",
-        55: "Drizzle",
-        61: "Rain",
-        63: "Rain",
-        65: "Rain",
-        66: "Frz rain",
-        67: "Frz rain",
-        71: "Snow",
-        73: "Snow",
-        75: "Snow",
-        77: "Snow",
-        80: "Shwrs",
-        81: "Shwrs",
-        82: "Shwrs",
-        95: "Storm",
-        96: "Storm",
-        99: "Storm"
-    }.get(code, "Weather")
-
-def get_weather():
-    cache_path = "/opt/piclock/weather_cache.json"
-    location = get_location()
-    if not location:
-        return None
-
-    # Check cached weather
-    try:
-        if os.path.exists(cache_path):
-            with open(cache_path, "r") as f:
-                cached = json.load(f)
-            if time.time() - cached.get("timestamp", 0) < 3600:  # 1 hour
-                return cached.get("weather")
-    except:
-        pass  # fail silently and try to re-fetch
-
-    try:
-        geocode_url = f"https://geocoding-api.open-meteo.com/v1/search?name={location}&count=1"
-        geo_res = requests.get(geocode_url, timeout=5)
-        geo_res.raise_for_status()
-        geo_data = geo_res.json()
-        if "results" not in geo_data or not geo_data["results"]:
-            return None
-        lat = geo_data["results"][0]["latitude"]
-        lon = geo_data["results"][0]["longitude"]
-
-        weather_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
-        weather_res = requests.get(weather_url, timeout=5)
-        weather_res.raise_for_status()
-        weather_data = weather_res.json()
-
-        if "current_weather" in weather_data:
-            temp = weather_data["current_weather"]["temperature"]
-            code = weather_data["current_weather"]["weathercode"]
-            summary = weather_summary(code)
-            result = f"{temp:.1f}C {summary}"[:16]
-
-            # Save cache
-            with open(cache_path, "w") as f:
-                json.dump({
-                    "timestamp": time.time(),
-                    "weather": result
-                }, f)
-
-            return result
-    except:
-        return None
-
-# Display logic
-last_display = ["", ""]
-
-def draw_main():
-    global last_display
-    line1 = datetime.datetime.now().strftime("%I:%M %p %b %d")[:16]
-    line2 = get_custom_message() or get_weather() or "No weather data"
-
-    if [line1, line2] != last_display:
-        lcd.clear()
-        lcd.message(f"{line1}\n{line2[:16]}")
-        last_display = [line1, line2[:16]]
-
-def draw_menu():
-    lcd.clear()
-    lcd.message(f"Backlight:\n> {COLORS[menu_index][0]}")
-
-def apply_color():
-    name, rgb = COLORS[menu_index]
-    lcd.set_color(*rgb)
-    lcd.clear()
-    lcd.message(f"Set to:\n{name}")
-    time.sleep(1.5)
-
-# Boot message
-lcd.message("  PiClock v2.0\n= Wife Edition =")
-time.sleep(2)
-lcd.clear()
-
-# Main loop
-try:
-    while True:
-        if in_menu:
-            draw_menu()
-            while in_menu:
-                if lcd.is_pressed(BUTTONS["up"]):
-                    menu_index = (menu_index - 1) % len(COLORS)
-                    draw_menu()
-                    time.sleep(0.2)
-                elif lcd.is_pressed(BUTTONS["down"]):
-                    menu_index = (menu_index + 1) % len(COLORS)
-                    draw_menu()
-                    time.sleep(0.2)
-                elif lcd.is_pressed(BUTTONS["right"]):
-                    apply_color()
-                    in_menu = False
-                elif lcd.is_pressed(BUTTONS["left"]):
-                    lcd.clear()
-                    in_menu = False
-                time.sleep(0.1)
-        else:
-            draw_main()
+NOTICE_SECONDS = 2
+SPLASH_MIN_SECONDS = 1  # The splash stays up at least this long...
+SPLASH_SECONDS = 4  # ...and at most this long while waiting for the first weather
+
+class Clock:
+    """The clock face, backlight menu and everything feeding them.
+
+    Nothing touches hardware or starts threads until start() is called, and
+    the components can be passed in, so the clock can be driven against a
+    SimulatedBackend in tests and benchmarks.
+    """
+
+    def __init__(self, backend, config=None, weather=None, scheduler=None, lcd_service=None, metrics=None):
+        self.lcd = backend
+        # All text goes through the renderer so only changed cells are rewritten
+        self.renderer = FrameRenderer(backend)
+        # Weather icons and the degree sign live in the LCD's eight custom character slots
+        self.glyphs = GlyphCache(backend, on_upload=self.renderer.forget_cursor)
+
+        # The main loop sleeps until the next minute unless a button press, web edit,
+        # LCD command or weather update is posted. Anything that isn't a ButtonEvent
+        # just means "redraw now".
+        self.scheduler = scheduler or Scheduler()
+
+        # Config files edited by the web UI are kept in memory and reloaded only when they change
+        self.config = config or ConfigWatcher(on_change=self.on_config_change)
+
+        # Weather is refreshed in the background so the display loop never waits on the network
+        self.weather = weather or WeatherWorker(
+            on_update=lambda result: self.scheduler.post(),
+            location_source=self.current_location,
+            on_fetch=self.record_fetch
+        )
+
+        # The web UI sends display commands here instead of opening the LCD itself,
+        # and reads the metrics below through it for its /metrics endpoint
+        self.lcd_service = lcd_service or LcdService(on_pending=self.scheduler.post)
+        self.metrics = metrics or self._create_metrics()
+        self.lcd_service.queries["metrics"] = self.metrics.render
+
+        self.buttons = ButtonReader(backend, self.scheduler.events)
+
+        self.last_color_name = None  # Color currently on the backlight, from any source
+        # Last value seen in backlight.txt. It is applied only when it changes, so a color picked
+        # on the menu or sent over the socket isn't undone by an older value in the file.
+        self._saved_color = None
+        self.menu_index = 0
+        self.in_menu = False
+        self.notice = None  # (lines, expires_at) for a short message shown over the clock face
+        # Line 2 rotates between the message, weather for each location and date, scrolling anything too long
+        self.marquee = Marquee(backend.cols)
+        self._marquee_timer = None
+        self._clock_text = (None, "", "")  # (minute, clock line, date page), formatted once a minute
+        self.boot_started = None
+        self.boot_seconds = None  # Boot to first clock face, once it has been drawn
+
+    def _create_metrics(self):
+        metrics = Metrics()
+        metrics.histogram("loop_iteration_seconds", "Time the main loop spends working per wakeup, excluding sleep")
+        metrics.histogram("button_latency_seconds", "Time from a button being read to the main loop handling it")
+        metrics.histogram("weather_fetch_seconds", "Duration of weather fetch attempts")
+        metrics.counter("weather_fetches_total", "Weather fetch attempts by result")
+        metrics.counter("draws_total", "Frames sent to the LCD renderer")
+        metrics.counter("lcd_bytes_total", "Bytes written to the HD44780 (characters and cursor moves)")
+        metrics.counter("glyph_cache_total", "Custom glyph lookups by result")
+        metrics.counter("geocode_cache_total", "Geocode cache lookups by result")
+        metrics.counter("scheduler_wakeups_total", "Main loop wakeups")
+        metrics.gauge("weather_last_success_timestamp", "Unix time of the last successful weather fetch")
+
+        # Read from the components' own counters only when scraped
+        def collect():
+            return [
+                ("draws_total", {}, self.renderer.frames),
+                ("lcd_bytes_total", {}, self.renderer.bytes_written),
+                ("glyph_cache_total", {"result": "hit"}, self.glyphs.hits),
+                ("glyph_cache_total", {"result": "miss"}, self.glyphs.uploads),
+                ("geocode_cache_total", {"result": "hit"}, geocode_stats["hits"]),
+                ("geocode_cache_total", {"result": "miss"}, geocode_stats["misses"]),
+                ("scheduler_wakeups_total", {}, self.scheduler.wakeups),
+                ("weather_last_success_timestamp", {}, self.weather.last_success()),
+            ]
+        metrics.add_collector(collect)
+        return metrics
+
+    def record_fetch(self, seconds, succeeded):
+        # Runs on the weather thread
+        self.metrics.observe("weather_fetch_seconds", seconds)
+        self.metrics.inc("weather_fetches_total", result="success" if succeeded else "failure")
+
+    def on_config_change(self, name, value):
+        # Runs on the watcher thread; a new location should not wait for the next weather check
+        if name == "location.txt":
+            self.weather.refresh()
+        self.scheduler.post()
+
+    def current_location(self):
+        # The weather worker starts before the config has finished loading
+        self.config.loaded.wait(10)
+        return self.config.get("location.txt")
+
+    def set_color(self, name):
+        if name != self.last_color_name and name in COLORS_DICT:
+            self.lcd.set_color(*COLORS_DICT[name])
+            self.last_color_name = name
+
+    def apply_saved_color(self):
+        saved = self.config.get("backlight.txt")
+        if saved != self._saved_color:
+            self._saved_color = saved
+            self.set_color(saved)
+
+    def _load_config(self):
+        self.config.load()
+        # Try restoring saved color
+        try:
+            self.apply_saved_color()
+        except Exception as e:
+            print(f"Backlight restore failed: {e}")
+
+    def start(self, splash_seconds=SPLASH_SECONDS, boot_started=BOOT_STARTED):
+        self.boot_started = boot_started
+        self.lcd.set_color(1.0, 1.0, 1.0)  # Default white
+        # Boot message
+        self.renderer.render("  PiClock v2.0", "= Wife Edition =")
+
+        # Warm everything up behind the splash: the weather worker loads its cache,
+        # resolves the location and fetches if needed while the config loads and
+        # the saved backlight is restored.
+        self.weather.start()
+        loader = threading.Thread(target=self._load_config, name="config-load", daemon=True)
+        loader.start()
+        try:
+            self.lcd_service.start()
+        except OSError as e:
+            print(f"LCD command socket unavailable: {e}")
+        loader.join()
+        self.config.start()
 
+        # Leave the splash up until there is weather to show, within limits
+        time.sleep(max(0, boot_started + SPLASH_MIN_SECONDS - time.monotonic()))
+        self.weather.ready.wait(max(0, boot_started + splash_seconds - time.monotonic()))
+
+        self.buttons.start()
+
+    def stop(self):
+        self.buttons.stop()
+        self.lcd_service.stop()
+        self.weather.stop()
+
+    def weather_pages(self):
+        # One page per location, labelled when there is more than one
+        entries = self.weather.entries()
+        stale = self.weather.is_stale()
+        pages = []
+        for location, conditions in entries:
+            if conditions["code"] is not None:
+                icon = self.glyphs.char(weather_icon(conditions["code"]))
+                degree = self.glyphs.char("degree")
+                text = f"{icon} {conditions['temperature']:.1f}{degree}C {weather_summary(conditions['code'])}"
+            else:
+                text = conditions["text"]
+            if len(entries) > 1:
+                text = f"{location_label(location)} {text}"
+            if stale:
+                # Mark weather that is past its cache lifetime because refreshes are failing
+                text = text + "*"
+            pages.append(text)
+        return pages
+
+    def _clock_lines(self, now):
+        minute = now.replace(second=0, microsecond=0)
+        if self._clock_text[0] != minute:
+            self._clock_text = (minute, now.strftime("%I:%M %p %b %d"), now.strftime("%A %B %d"))
+        return self._clock_text[1], self._clock_text[2]
+
+    def _schedule_marquee(self):
+        next_change = self.marquee.next_change()
+        if next_change is not None and next_change != self._marquee_timer:
+            self._marquee_timer = next_change
+            self.scheduler.call_later(next_change - time.monotonic(), "marquee")
+
+    def show_notice(self, *lines, seconds=NOTICE_SECONDS):
+        self.notice = (lines, time.time() + seconds)
+        self.scheduler.call_later(seconds, "notice")
+
+    def handle_lcd_commands(self):
+        for command in self.lcd_service.take():
+            if command["cmd"] == "color":
+                name = command.get("name")
+                if name not in COLORS_DICT:
+                    continue
+                self.set_color(name)
+                self.show_notice("Backlight:", name)
+            elif command["cmd"] == "notice":
+                self.show_notice(*command.get("lines", []), seconds=command.get("seconds", NOTICE_SECONDS))
+
+    # Display logic
+    def draw_main(self, now=None):
+        if self.notice:
+            lines, expires_at = self.notice
+            if time.time() < expires_at:
+                self.renderer.render(*lines)
+                return
+            self.notice = None
+
+        now = now or datetime.datetime.now()
+        line1, date = self._clock_lines(now)
+        self.glyphs.begin_frame()
+        pages = [self.config.get("msg.txt"), *(self.weather_pages() or ["No weather data"]), date]
+        self.marquee.update(pages, parse_scroll_speed(self.config.get("scroll_speed.txt")))
+        line2 = self.marquee.frame()
+        self.renderer.render(line1, line2)
+        self._schedule_marquee()
+
+        if self.boot_started is not None and self.boot_seconds is None:
+            self.boot_seconds = time.monotonic() - self.boot_started
+            print(f"Boot to first clock face: {self.boot_seconds:.2f}s (weather ready: {self.weather.ready.is_set()})")
+
+    def draw_menu(self):
+        self.renderer.render("Backlight:", f"> {COLORS[self.menu_index][0]}")
+
+    def apply_color(self):
+        name = COLORS[self.menu_index][0]
+        self.set_color(name)
+        self.show_notice("Set to:", name, seconds=1.5)
+
+    def handle_button(self, event):
+        if not self.in_menu:
+            if event.kind == "press" and event.button == "select":
+                self.in_menu = True
+                self.draw_menu()
+            return
+
+        if event.kind in ("press", "repeat") and event.button in ("up", "down"):
+            step = -1 if event.button == "up" else 1
+            self.menu_index = (self.menu_index + step) % len(COLORS)
+            self.draw_menu()
+        elif event.kind == "press" and event.button == "right":
+            self.apply_color()
+            self.in_menu = False
+        elif event.kind == "press" and event.button == "left":
+            self.in_menu = False
+
+    def step(self):
+        # One pass of the main loop: bring the display up to date, then sleep until something happens
+        started = time.perf_counter()
+        if not self.in_menu:
+            self.handle_lcd_commands()
             # Check for backlight color changes from web interface
-            try:
-                if os.path.exists(COLOR_PATH):
-                    with open(COLOR_PATH, "r") as f:
-                        name = f.read().strip()
-                        if name != last_color_name and name in COLORS_DICT:
-                            lcd.set_color(*COLORS_DICT[name])
-                            last_color_name = name
-            except Exception as e:
-                print(f"Error checking backlight.txt: {e}")
-
-            for _ in range(10):
-                if lcd.is_pressed(BUTTONS["select"]):
-                    in_menu = True
-                    break
-                time.sleep(0.1)
-
-except KeyboardInterrupt:
-    lcd.clear()
-    lcd.set_color(0.0, 0.0, 0.0)
-    lcd.message("Shutting down LCD")
+            self.apply_saved_color()
+            self.draw_main()
+        busy = time.perf_counter() - started
+
+        event = self.scheduler.wait()
+        started = time.perf_counter()
+        if isinstance(event, ButtonEvent):
+            self.handle_button(event)
+            self.metrics.observe("button_latency_seconds", time.monotonic() - event.timestamp)
+        self.metrics.observe("loop_iteration_seconds", busy + time.perf_counter() - started)
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                self.step()
+        except KeyboardInterrupt:
+            self.stop()
+            self.lcd.clear()
+            self.lcd.set_color(0.0, 0.0, 0.0)
+            self.lcd.message("Shutting down LCD")
+
+def main():
+    parser = argparse.ArgumentParser(description="PiClock display")
+    parser.add_argument("--backend", help="adafruit (default) or sim; also read from $PICLOCK_BACKEND")
+    args = parser.parse_args()
+    Clock(get_backend(args.backend)).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import time
+
+DEFAULT_SCROLL_SPEED = 4  # Characters per second
+MIN_SCROLL_SPEED = 1
+MAX_SCROLL_SPEED = 10
+PAGE_SECONDS = 5  # How long a page that fits is shown before moving on
+SCROLL_PAUSE = 1.5  # Pause on the start of a long page before it scrolls
+SCROLL_GAP = "   "
+
+def parse_scroll_speed(value):
+    try:
+        speed = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_SCROLL_SPEED
+    return max(MIN_SCROLL_SPEED, min(MAX_SCROLL_SPEED, speed))
+
+class Marquee:
+    """Rotates a line between pages, scrolling the ones that don't fit.
+
+    Every frame is cut out of the page text once, when the pages or speed
+    change, and stored with how long it stays up. Each tick then only
+    advances an index. A page that fits is held for PAGE_SECONDS; a long
+    one pauses, then scrolls through one full loop so it ends where it
+    started.
+    """
+
+    def __init__(self, width=16, speed=DEFAULT_SCROLL_SPEED):
+        self.width = width
+        self.speed = speed
+        self.pages = ()
+        self._timeline = [(" " * width, None)]  # (frame text, seconds shown or None for forever)
+        self._index = 0
+        self._next_change = None
+
+    def _page_frames(self, text):
+        if len(text) <= self.width:
+            return [(text.ljust(self.width), PAGE_SECONDS)]
+        # Scroll over text + gap + the start again, so the last frame lines up with the first
+        loop = text + SCROLL_GAP + text[:self.width]
+        step = 1 / self.speed
+        frames = [(loop[:self.width], SCROLL_PAUSE)]
+        frames += [(loop[i:i + self.width], step) for i in range(1, len(text) + len(SCROLL_GAP) + 1)]
+        return frames
+
+    def update(self, pages, speed=None, now=None):
+        """Sets the pages to rotate through; frames are rebuilt only if something changed."""
+        pages = tuple(page for page in pages if page)
+        speed = speed or self.speed
+        if pages == self.pages and speed == self.speed:
+            return False
+        self.pages = pages
+        self.speed = speed
+
+        timeline = []
+        for page in pages:
+            timeline += self._page_frames(page)
+        if len(pages) == 1 and len(timeline) == 1:
+            timeline = [(timeline[0][0], None)]  # A single short page never changes
+        self._timeline = timeline or [(" " * self.width, None)]
+        self._index = 0
+        duration = self._timeline[0][1]
+        if now is None:
+            now = time.monotonic()
+        self._next_change = None if duration is None else now + duration
+        return True
+
+    def frame(self, now=None):
+        """Returns the frame to show now, advancing past any that have expired."""
+        if self._next_change is not None:
+            if now is None:
+                now = time.monotonic()
+            if now - self._next_change > PAGE_SECONDS:
+                # We weren't ticked for a while (e.g. the menu was open); carry on from here
+                self._next_change = now
+            while now >= self._next_change:
+                self._index = (self._index + 1) % len(self._timeline)
+                self._next_change += self._timeline[self._index][1]
+        return self._timeline[self._index][0]
+
+    def next_change(self):
+        """Monotonic time of the next frame change, or None if the line is static."""
+        return self._next_change
@@ -0,0 +1,102 @@
+import bisect
+import threading
+
+# Upper bounds in seconds, from a fast redraw up to a slow network call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metrics:
+    """Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Recording is an add under a lock, cheap enough for the render loop.
+    Values that components already count themselves (renderer bytes, glyph
+    cache hits) are read by collectors only when render() is called, so
+    they cost nothing between scrapes.
+    """
+
+    def __init__(self, prefix="piclock_"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._kinds = {}  # name -> (kind, help, buckets), in declaration order
+        self._values = {}  # (name, labels) -> number
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self._collectors = []
+
+    def counter(self, name, help):
+        self._kinds[name] = ("counter", help, None)
+
+    def gauge(self, name, help):
+        self._kinds[name] = ("gauge", help, None)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        self._kinds[name] = ("histogram", help, tuple(buckets))
+
+    def add_collector(self, func):
+        # func() returns (name, labels dict, value) tuples for declared counters or gauges
+        self._collectors.append(func)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._kinds[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        collected = []
+        for collector in self._collectors:
+            try:
+                collected += [(name, tuple(sorted(labels.items())), value) for name, labels, value in collector()]
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        with self._lock:
+            values = list(self._values.items()) + [((name, labels), value) for name, labels, value in collected]
+            histograms = [(key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items()]
+
+        lines = []
+        for name, (kind, help, buckets) in self._kinds.items():
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {help}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind != "histogram":
+                for (value_name, labels), value in values:
+                    if value_name == name:
+                        lines.append(f"{full_name}{_label_text(labels)} {_number(value)}")
+                continue
+            for (value_name, labels), (counts, total, count) in histograms:
+                if value_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{_label_text(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{full_name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{full_name}_sum{_label_text(labels)} {_number(total)}")
+                lines.append(f"{full_name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,59 @@
+import time
+import heapq
+import queue
+import itertools
+
+class Scheduler:
+    """Sleeps the main loop until there is something to draw.
+
+    wait() returns as soon as an event is posted, when a timer set with
+    call_at()/call_later() fires, or at the next minute boundary, since the
+    clock face only shows hours and minutes. Timer firings come back as
+    their name ("minute" for the boundary); posted events come back as-is.
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.wakeups = 0  # Total since startup
+        self.wakeups_this_hour = 0
+        self.wakeups_last_hour = None  # None until the first full hour has passed
+        self._timers = []
+        self._seq = itertools.count()
+        self._hour = int(time.time() // 3600)
+
+    def post(self, event=None):
+        # Safe to call from any thread
+        self.events.put(event)
+
+    def call_at(self, when, name):
+        heapq.heappush(self._timers, (when, next(self._seq), name))
+
+    def call_later(self, delay, name):
+        self.call_at(time.time() + delay, name)
+
+    def _count_wakeup(self, now):
+        hour = int(now // 3600)
+        if hour != self._hour:
+            self.wakeups_last_hour = self.wakeups_this_hour
+            self.wakeups_this_hour = 0
+            self._hour = hour
+            print(f"Main loop wakeups in the last hour: {self.wakeups_last_hour}")
+        self.wakeups += 1
+        self.wakeups_this_hour += 1
+
+    def wait(self):
+        now = time.time()
+        deadline = (int(now // 60) + 1) * 60
+        name = "minute"
+        if self._timers and self._timers[0][0] < deadline:
+            deadline, _, name = self._timers[0]
+
+        try:
+            event = self.events.get(timeout=max(0, deadline - now))
+        except queue.Empty:
+            event = name
+            if self._timers and self._timers[0][2] == name and self._timers[0][0] <= time.time():
+                heapq.heappop(self._timers)
+
+        self._count_wakeup(time.time())
+        return event
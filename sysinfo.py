@@ -0,0 +1,115 @@
+import os
+import threading
+import subprocess
+
+LOCALTIME_PATH = "/etc/localtime"
+NTP_CONFIG_PATH = "/etc/systemd/timesyncd.conf"
+
+_lock = threading.Lock()
+_timezones = None
+_timezone_cache = (None, None)  # (mtime of /etc/localtime, zone name)
+_ntp_cache = (None, None)  # (mtime of timesyncd.conf, server string)
+
+def _run(args):
+    return subprocess.run(args, capture_output=True, text=True, check=True)
+
+# Runs every command here; web_control swaps in a version that records how long each took
+run_command = _run
+
+def set_command_runner(runner):
+    global run_command
+    run_command = runner
+
+def _mtime(path, follow_symlinks=True):
+    try:
+        return os.stat(path, follow_symlinks=follow_symlinks).st_mtime_ns
+    except OSError:
+        return None
+
+def clear_caches():
+    global _timezones, _timezone_cache, _ntp_cache
+    with _lock:
+        _timezones = None
+        _timezone_cache = (None, None)
+        _ntp_cache = (None, None)
+
+# Timezone functions
+def get_available_timezones():
+    # The zone list only changes with a tzdata upgrade, so it is fetched once per process
+    global _timezones
+    with _lock:
+        if _timezones is not None:
+            return _timezones
+    try:
+        result = run_command(["timedatectl", "list-timezones"])
+        timezones = result.stdout.strip().split("\n")
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting available timezones: {e}. Stderr: {e.stderr or 'N/A'}")
+        # Flashing here might be too noisy for a GET operation, returning empty list is okay.
+        return []
+    except FileNotFoundError:
+        print("Error: timedatectl command not found. Cannot get available timezones.")
+        return []
+    with _lock:
+        _timezones = timezones
+    return timezones
+
+def _timezone_from_timedatectl():
+    try:
+        result = run_command(["timedatectl", "status"])
+        for line in result.stdout.split("\n"):
+            if "Time zone:" in line:
+                return line.split(":", 1)[1].strip().split(" ")[0]
+        return "UTC" # Default if not found
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting current timezone: {e}. Stderr: {e.stderr or 'N/A'}")
+        return "UTC" # Default on error
+    except FileNotFoundError:
+        print("Error: timedatectl command not found. Cannot get current timezone.")
+        return "UTC"
+
+def get_current_timezone():
+    # timedatectl set-timezone replaces the /etc/localtime symlink, which changes its mtime
+    global _timezone_cache
+    mtime = _mtime(LOCALTIME_PATH, follow_symlinks=False)
+    with _lock:
+        if mtime is not None and _timezone_cache[0] == mtime:
+            return _timezone_cache[1]
+
+    timezone = None
+    try:
+        target = os.readlink(LOCALTIME_PATH)
+        if "zoneinfo/" in target:
+            timezone = target.split("zoneinfo/", 1)[1]
+    except OSError:
+        pass
+    if not timezone:
+        timezone = _timezone_from_timedatectl()
+
+    with _lock:
+        _timezone_cache = (mtime, timezone)
+    return timezone
+
+# NTP Server functions
+def get_current_ntp_server():
+    global _ntp_cache
+    mtime = _mtime(NTP_CONFIG_PATH)
+    with _lock:
+        if mtime is not None and _ntp_cache[0] == mtime:
+            return _ntp_cache[1]
+
+    ntp_server = ""
+    try:
+        if mtime is not None:
+            with open(NTP_CONFIG_PATH, "r") as f:
+                for line in f:
+                    if line.strip().startswith("NTP="):
+                        ntp_server = line.strip().split("=", 1)[1]
+                        break
+    except Exception as e:
+        print(f"Error reading NTP config: {e}")
+        return "" # Return empty or a default/error indicator
+
+    with _lock:
+        _ntp_cache = (mtime, ntp_server)
+    return ntp_server
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are flat scripts in the repo root, like the benchmarks import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
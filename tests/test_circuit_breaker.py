@@ -0,0 +1,97 @@
+"""Weather fetch backoff: retry delays, the open circuit, its trial request and restarts."""
+import json
+import time
+
+import pytest
+
+import weather
+from weather import CircuitBreaker, RETRY_BASE, RETRY_MAX, BREAKER_THRESHOLD, BREAKER_COOLDOWN
+
+class FailingSession:
+    """Stands in for requests.Session: counts calls and fails every one."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        raise OSError("network unreachable")
+
+@pytest.fixture
+def session(monkeypatch):
+    stub = FailingSession()
+    monkeypatch.setattr(weather, "get_session", lambda: stub)
+    return stub
+
+def make_worker(tmp_path):
+    return weather.WeatherWorker(cache_path=str(tmp_path / "weather_cache.json"),
+                                 geocode_cache_path=str(tmp_path / "geocode_cache.json"),
+                                 location_source=lambda: "Toronto")
+
+def delay(breaker):
+    return breaker.retry_at - time.time()
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    breaker = CircuitBreaker()
+    expected = RETRY_BASE
+    for _ in range(BREAKER_THRESHOLD - 1):
+        breaker.record_failure()
+        assert delay(breaker) == pytest.approx(min(expected, RETRY_MAX), abs=1)
+        assert not breaker.is_open
+        assert not breaker.allow()
+        expected *= 2
+
+def test_circuit_opens_after_threshold_failures():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD):
+        breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+    assert delay(breaker) == pytest.approx(BREAKER_COOLDOWN, abs=1)
+
+def test_success_closes_the_circuit():
+    breaker = CircuitBreaker(BREAKER_THRESHOLD, time.time() + BREAKER_COOLDOWN)
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+    assert breaker.failures == 0
+
+def test_a_single_trial_after_the_cooldown(tmp_path, session):
+    # Circuit open for Toronto, but the cooldown has just run out
+    (tmp_path / "weather_cache.json").write_text(json.dumps({
+        "failures": BREAKER_THRESHOLD, "retry_at": time.time() - 1, "attempted": ["Toronto"],
+    }))
+    worker = make_worker(tmp_path)
+    worker.start()
+    try:
+        assert worker.ready.wait(5)
+        time.sleep(1.5)
+    finally:
+        worker.stop()
+
+    assert session.calls == 1  # One trial request, which failed...
+    assert worker.breaker.is_open  # ...so the circuit is open for another cooldown
+    assert delay(worker.breaker) == pytest.approx(BREAKER_COOLDOWN, abs=5)
+
+def test_backoff_survives_a_restart(tmp_path, session):
+    worker = make_worker(tmp_path)
+    for _ in range(BREAKER_THRESHOLD):
+        assert not worker._update(("Toronto",))
+    worker._attempted = ("Toronto",)
+    worker._save()
+    calls = session.calls
+
+    restarted = make_worker(tmp_path)
+    restarted.load()
+    assert restarted.breaker.failures == BREAKER_THRESHOLD
+    assert restarted.breaker.retry_at == pytest.approx(worker.breaker.retry_at)
+    assert restarted.breaker.is_open
+
+    restarted.start()
+    try:
+        assert restarted.ready.wait(5)
+        restarted.refresh()  # Ignored while the circuit is open
+        time.sleep(1.5)
+    finally:
+        restarted.stop()
+    assert session.calls == calls
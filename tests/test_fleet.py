@@ -0,0 +1,101 @@
+"""Fleet mode against several local stand-in web UIs, one of them down."""
+import os
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+
+import pytest
+
+import fleet
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, process, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"web_control exited with {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"web_control did not start on port {port}")
+
+@pytest.fixture
+def stand_ins(tmp_path):
+    """Two web UIs on their own ports and config directories, plus a port nobody listens on."""
+    processes = []
+    clocks = []
+    try:
+        for name in ("kitchen", "bedroom"):
+            directory = tmp_path / name
+            directory.mkdir()
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(REPO, "web_control.py"), "--host", "127.0.0.1",
+                 "--port", str(port), "--workers", "2", "--config-dir", str(directory)],
+                cwd=REPO, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(process)
+            wait_for_port(port, process)
+            clocks.append((f"127.0.0.1:{port}", directory))
+        yield clocks, f"127.0.0.1:{free_port()}"
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(10)
+
+def test_apply_to_fleet_reports_each_clock(stand_ins, capsys):
+    clocks, dead = stand_ins
+    endpoints = [endpoint for endpoint, _ in clocks] + [dead]
+    results = asyncio.run(fleet.apply_to_fleet(endpoints, {"message": "Dinner at 6", "color": "Blue"},
+                                               timeout=2, retries=1))
+
+    assert [result["endpoint"] for result in results] == endpoints
+    for result, (_, directory) in zip(results, clocks):
+        assert result["ok"], result
+        assert [step["step"] for step in result["steps"]] == ["display", "color"]
+        assert (directory / "msg.txt").read_text() == "Dinner at 6"
+        assert (directory / "backlight.txt").read_text() == "Blue"
+
+    down = results[-1]
+    assert not down["ok"]
+    assert len(down["steps"]) == 1  # Unreachable, so the color step was skipped
+    assert not down["steps"][0]["ok"]
+
+    fleet.print_summary(results)
+    assert "2/3 clocks updated" in capsys.readouterr().out
+
+def test_stand_ins_keep_separate_config(stand_ins):
+    (kitchen, kitchen_dir), (bedroom, bedroom_dir) = stand_ins[0]
+    fleet.push([kitchen], {"message": "Kitchen only"}, timeout=2, retries=0)
+    fleet.push([bedroom], {"message": "Bedroom only"}, timeout=2, retries=0)
+    assert (kitchen_dir / "msg.txt").read_text() == "Kitchen only"
+    assert (bedroom_dir / "msg.txt").read_text() == "Bedroom only"
+
+def test_garbled_reply_fails_only_that_clock(stand_ins):
+    clocks, _ = stand_ins
+
+    async def run():
+        async def garbled(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nnot-hex\r\n{}\r\n0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+        server = await asyncio.start_server(garbled, "127.0.0.1", 0)
+        bad = f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        async with server:
+            return bad, await fleet.apply_to_fleet([clocks[0][0], bad], {"message": "Hi"}, timeout=2, retries=0)
+
+    bad, results = asyncio.run(run())
+    assert results[0]["ok"]
+    assert results[1]["endpoint"] == bad
+    assert not results[1]["ok"]
+    assert "ValueError" in results[1]["steps"][0]["detail"]
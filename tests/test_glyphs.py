@@ -0,0 +1,80 @@
+"""CGRAM slot management for custom glyphs, checked against the simulator's create_char log."""
+import pytest
+
+import glyphs
+from glyphs import GlyphCache, CGRAM_SLOTS, FALLBACKS
+from hal import SimulatedBackend
+
+def uploads(backend):
+    return [(slot, bitmap) for kind, slot, bitmap in backend.writes if kind == "create_char"]
+
+def uploaded_names(backend):
+    by_bitmap = {bitmap: name for name, bitmap in glyphs.GLYPHS.items()}
+    return [by_bitmap[bitmap] for _, bitmap in uploads(backend)]
+
+@pytest.fixture
+def backend():
+    return SimulatedBackend()
+
+def test_resident_glyph_is_not_uploaded_again(backend):
+    cache = GlyphCache(backend)
+    first = cache.char("sun")
+    for _ in range(3):
+        cache.begin_frame()
+        assert cache.char("sun") == first
+    assert len(uploads(backend)) == 1
+    assert cache.uploads == 1
+    assert cache.hits == 3
+    assert backend.cgram[ord(first)] == glyphs.GLYPHS["sun"]
+
+def test_least_recently_used_glyph_is_evicted(backend):
+    cache = GlyphCache(backend, slots=2)
+    sun = cache.char("sun")
+    cloud = cache.char("cloud")
+    cache.begin_frame()
+    cache.char("sun")  # cloud is now the least recently used
+    cache.begin_frame()
+    rain = cache.char("rain")
+
+    assert rain == cloud  # Took cloud's slot
+    assert uploaded_names(backend) == ["sun", "cloud", "rain"]
+    cache.begin_frame()
+    assert cache.char("sun") == sun
+    assert len(uploads(backend)) == 3  # sun survived the eviction
+
+def test_glyphs_used_this_frame_are_not_evicted(backend):
+    cache = GlyphCache(backend, slots=2)
+    cache.char("sun")
+    cache.char("cloud")
+    cache.begin_frame()
+    cache.char("cloud")
+    cache.char("sun")  # Both on screen this frame; sun is the most recent
+    rain = cache.char("rain")
+
+    assert rain == FALLBACKS["rain"]
+    assert len(uploads(backend)) == 2
+
+    cache.begin_frame()
+    cache.char("sun")
+    # cloud wasn't used this frame, so it can go even though sun is older in the LRU order
+    assert cache.char("rain") == chr(1)
+    assert uploaded_names(backend)[-1] == "rain"
+
+def test_fallback_when_every_slot_is_pinned(backend, monkeypatch):
+    names = [f"test{i}" for i in range(CGRAM_SLOTS)]
+    for i, name in enumerate(names):
+        monkeypatch.setitem(glyphs.GLYPHS, name, (i,) * 8)
+    cache = GlyphCache(backend)
+    chars = [cache.char(name) for name in names]
+
+    assert sorted(ord(char) for char in chars) == list(range(CGRAM_SLOTS))
+    assert cache.char("degree") == FALLBACKS["degree"]
+    assert cache.char("storm") == FALLBACKS["storm"]
+    assert len(uploads(backend)) == CGRAM_SLOTS
+
+def test_upload_notifies_the_renderer(backend):
+    calls = []
+    cache = GlyphCache(backend, on_upload=lambda: calls.append(True))
+    cache.char("fog")
+    cache.char("fog")
+    assert len(calls) == 1
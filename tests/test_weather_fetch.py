@@ -0,0 +1,118 @@
+"""Batched multi-location weather against a local stand-in for the Open-Meteo APIs."""
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+import weather
+
+# name -> (latitude, longitude); anything else has no geocoding results
+PLACES = {
+    "Toronto": (43.7, -79.4),
+    "Paris": (48.9, 2.3),
+    "Tokyo": (35.7, 139.7),
+}
+
+class StubOpenMeteo(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, query))
+        if url.path == "/geocode":
+            place = PLACES.get(query["name"])
+            body = {"results": [{"latitude": place[0], "longitude": place[1]}]} if place else {}
+        else:
+            # Temperature is the latitude, so each answer can be matched to its location
+            body = [{"current_weather": {"temperature": float(latitude), "weathercode": 3}}
+                    for latitude in query["latitude"].split(",")]
+            if len(body) == 1:
+                body = body[0]  # Open-Meteo answers a single coordinate pair with an object
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = HTTPServer(("127.0.0.1", 0), StubOpenMeteo)
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    monkeypatch.setattr(weather, "GEOCODE_URL", base + "/geocode")
+    monkeypatch.setattr(weather, "FORECAST_URL", base + "/forecast")
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def paths(server):
+    return [path for path, _ in server.requests]
+
+@pytest.fixture
+def geocode_cache(tmp_path):
+    return str(tmp_path / "geocode_cache.json")
+
+def test_one_forecast_request_for_all_locations(server, geocode_cache):
+    results = weather.fetch_weather(["Toronto", "Paris", "Tokyo"], geocode_cache)
+
+    assert paths(server).count("/forecast") == 1
+    forecast = dict(server.requests)["/forecast"]
+    assert forecast["latitude"] == "43.7,48.9,35.7"
+    assert forecast["longitude"] == "-79.4,2.3,139.7"
+    assert {location: result["temperature"] for location, result in results.items()} == \
+        {"Toronto": 43.7, "Paris": 48.9, "Tokyo": 35.7}
+    assert results["Paris"]["text"] == "48.9C Overcast"
+
+def test_single_location_object_response(server, geocode_cache):
+    results = weather.fetch_weather(["Paris"], geocode_cache)
+    assert results == {"Paris": {"text": "48.9C Overcast", "temperature": 48.9, "code": 3}}
+
+def test_location_that_cannot_be_geocoded_is_left_out(server, geocode_cache):
+    results = weather.fetch_weather(["Toronto", "Atlantis", "Tokyo"], geocode_cache)
+
+    assert list(results) == ["Toronto", "Tokyo"]
+    forecast = dict(server.requests)["/forecast"]
+    assert forecast["latitude"] == "43.7,35.7"
+
+def test_no_location_found_raises_location_not_found(server, geocode_cache):
+    with pytest.raises(weather.LocationNotFound):
+        weather.fetch_weather(["Atlantis"], geocode_cache)
+    assert "/forecast" not in paths(server)
+
+def test_geocode_cache_keeps_each_location_and_prunes_removed_ones(server, geocode_cache):
+    weather.fetch_weather(["Toronto", "Paris"], geocode_cache)
+    with open(geocode_cache) as f:
+        assert set(json.load(f)) == {"toronto", "paris"}
+
+    server.requests.clear()
+    weather.fetch_weather(["Paris", "Tokyo"], geocode_cache)
+    # Paris comes from the cache; only the new location is looked up
+    assert [query["name"] for path, query in server.requests if path == "/geocode"] == ["Tokyo"]
+    with open(geocode_cache) as f:
+        assert set(json.load(f)) == {"paris", "tokyo"}
+
+def test_worker_caches_an_entry_per_location(server, tmp_path, geocode_cache):
+    cache_path = str(tmp_path / "weather_cache.json")
+    worker = weather.WeatherWorker(cache_path=cache_path, geocode_cache_path=geocode_cache,
+                                   location_source=lambda: "Toronto\nParis")
+    assert worker._update(["Toronto", "Paris"])
+    assert [location for location, _ in worker.entries()] == ["Toronto", "Paris"]
+    assert worker.current() == "43.7C Overcast"
+
+    with open(cache_path) as f:
+        cached = json.load(f)
+    assert set(cached["locations"]) == {"Toronto", "Paris"}
+    assert cached["weather"] == "43.7C Overcast"  # First location, for readers that want one
+
+    # A restart shows every location from the cache without touching the network
+    server.requests.clear()
+    restarted = weather.WeatherWorker(cache_path=cache_path, geocode_cache_path=geocode_cache)
+    restarted.load()
+    assert [location for location, _ in restarted.entries()] == ["Toronto", "Paris"]
+    assert server.requests == []
@@ -0,0 +1,100 @@
+"""The display loop must keep drawing while the weather worker waits on the network."""
+import json
+import time
+import threading
+
+import pytest
+
+import weather
+from hal import SimulatedBackend
+from main import Clock
+from config_watch import ConfigWatcher
+from lcd_service import LcdService
+
+PROMPT = 0.1  # Far below the 5 s request timeout, far above a redraw
+
+class StubSession:
+    """Stands in for requests.Session: every get() blocks until released, then fails."""
+
+    def __init__(self):
+        self.called = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, url, params=None, timeout=None):
+        self.called.set()
+        self.release.wait(10)
+        raise OSError("network unreachable")
+
+@pytest.fixture
+def session(monkeypatch):
+    stub = StubSession()
+    monkeypatch.setattr(weather, "get_session", lambda: stub)
+    yield stub
+    stub.release.set()
+
+@pytest.fixture
+def clock(tmp_path, session):
+    (tmp_path / "location.txt").write_text("Toronto")
+    # A good value that has expired, so the worker refetches as soon as it starts
+    (tmp_path / "weather_cache.json").write_text(json.dumps({
+        "timestamp": time.time() - 2 * weather.CACHE_TTL,
+        "locations": {"Toronto": {"text": "12.5C Partly cloudy", "temperature": 12.5, "code": 2}},
+    }))
+    config = ConfigWatcher(str(tmp_path))
+    config.load()
+    worker = weather.WeatherWorker(cache_path=str(tmp_path / "weather_cache.json"),
+                                   geocode_cache_path=str(tmp_path / "geocode_cache.json"),
+                                   location_source=lambda: config.get("location.txt"))
+    clock = Clock(SimulatedBackend(), config=config, weather=worker,
+                  lcd_service=LcdService(path=str(tmp_path / "lcd.sock")))
+    worker.start()
+    assert session.called.wait(5), "worker never tried to fetch"
+    yield clock
+    worker.stop()
+
+def timed(func):
+    started = time.monotonic()
+    func()
+    return time.monotonic() - started
+
+def test_draw_main_does_not_wait_for_a_fetch_in_progress(clock):
+    assert timed(clock.draw_main) < PROMPT
+    assert any("12.5" in page for page in clock.marquee.pages)
+
+def test_step_does_not_wait_for_a_fetch_in_progress(clock):
+    clock.scheduler.post()
+    assert timed(clock.step) < PROMPT
+    assert any("12.5" in page for page in clock.marquee.pages)
+
+def test_last_good_value_survives_a_failed_fetch(clock, session):
+    session.release.set()
+    deadline = time.monotonic() + 5
+    while clock.weather.breaker.failures == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert clock.weather.breaker.failures == 1
+
+    assert timed(clock.draw_main) < PROMPT
+    pages = clock.weather_pages()
+    assert len(pages) == 1
+    assert "12.5" in pages[0]
+    assert pages[0].endswith("*")  # Marked stale, but still shown
+
+@pytest.mark.parametrize("location", ["", "Atlantis"])
+def test_worker_idles_when_there_is_nothing_to_fetch(tmp_path, monkeypatch, location):
+    # No locations, or one that doesn't geocode: no 1 s polling, even after a refresh()
+    monkeypatch.setattr(weather, "geocode_all", lambda locations, cache_path: {})
+    checks = []
+    def location_source():
+        checks.append(time.monotonic())
+        return location
+    worker = weather.WeatherWorker(cache_path=str(tmp_path / "weather_cache.json"),
+                                   geocode_cache_path=str(tmp_path / "geocode_cache.json"),
+                                   location_source=location_source)
+    worker.start()
+    try:
+        assert worker.ready.wait(5)
+        worker.refresh()
+        time.sleep(2.5)
+    finally:
+        worker.stop()
+    assert len(checks) <= 3
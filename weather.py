@@ -0,0 +1,387 @@
+import json
+import time
+import threading
+from collections import Counter
+from config_store import atomic_write
+
+LOCATION_PATH = "/opt/piclock/location.txt"
+CACHE_PATH = "/opt/piclock/weather_cache.json"
+GEOCODE_CACHE_PATH = "/opt/piclock/geocode_cache.json"
+
+GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+CACHE_TTL = 3600  # 1 hour
+REFRESH_AHEAD = 300  # Start refreshing this long before the cache expires
+LOCATION_CHECK_INTERVAL = 60  # How often the worker looks for a new location.txt
+MAX_LOCATIONS = 10
+
+RETRY_BASE = 30  # First retry delay after a failed fetch, doubled on each failure
+RETRY_MAX = 1800
+BREAKER_THRESHOLD = 5  # Consecutive failures before the circuit opens
+BREAKER_COOLDOWN = 3600  # How long an open circuit blocks all fetches
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    # One pooled session so repeated lookups reuse the same connections
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests  # Deferred: it is slow to import and only the worker thread needs it
+            _session = requests.Session()
+        return _session
+
+def get_location(path=LOCATION_PATH):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except:
+        return None
+
+def parse_locations(text):
+    # location.txt holds one location per line; blank lines and repeats are ignored
+    locations = []
+    seen = set()
+    for line in (text or "").splitlines():
+        location = line.strip()
+        if location and normalize_location(location) not in seen:
+            seen.add(normalize_location(location))
+            locations.append(location)
+    return locations[:MAX_LOCATIONS]
+
+def location_label(location):
+    # "Paris, France" -> "Paris", for telling locations apart on the display
+    return location.split(",")[0].strip()
+
+def weather_summary(code):
+    return {
+        0: "Clear",
+        1: "Mainly clear",
+        2: "Partly cloudy",
+        3: "Overcast",
+        45: "Fog",
+        48: "Fog",
+        51: "Drizzle",
+        53: "Drizzle",
+        55: "Drizzle",
+        61: "Rain",
+        63: "Rain",
+        65: "Rain",
+        66: "Freezing rain",
+        67: "Freezing rain",
+        71: "Snow",
+        73: "Snow",
+        75: "Snow",
+        77: "Snow",
+        80: "Showers",
+        81: "Showers",
+        82: "Showers",
+        95: "Storm",
+        96: "Storm",
+        99: "Storm"
+    }.get(code, "Weather")
+
+def normalize_location(location):
+    return " ".join(location.split()).lower()
+
+# Geocode cache lookups in this process, for metrics
+geocode_stats = Counter()
+
+def geocode_all(locations, cache_path=GEOCODE_CACHE_PATH):
+    """Returns {location: coords} for every location that could be found.
+
+    Coordinates only change when location.txt does, so each location is
+    looked up once and kept in the cache until it is removed from the list.
+    """
+    cached = load_cache(cache_path)
+    keys = {normalize_location(location) for location in locations}
+    found = {}
+    changed = False
+    for location in locations:
+        key = normalize_location(location)
+        if key in cached:
+            geocode_stats["hits"] += 1
+        else:
+            geocode_stats["misses"] += 1
+            geo_res = get_session().get(GEOCODE_URL, params={"name": location, "count": 1}, timeout=5)
+            geo_res.raise_for_status()
+            geo_data = geo_res.json()
+            if "results" not in geo_data or not geo_data["results"]:
+                continue
+            cached[key] = {
+                "latitude": geo_data["results"][0]["latitude"],
+                "longitude": geo_data["results"][0]["longitude"]
+            }
+            changed = True
+        found[location] = cached[key]
+
+    # Drop locations that are no longer configured
+    kept = {key: coords for key, coords in cached.items() if key in keys}
+    if changed or len(kept) != len(cached):
+        save_cache(kept, cache_path)
+    return found
+
+def weather_icon(code):
+    # Name of the glyph in glyphs.GLYPHS for a WMO weather code
+    if code in (0, 1):
+        return "sun"
+    if code in (2, 3):
+        return "cloud"
+    if code in (45, 48):
+        return "fog"
+    if code in (71, 73, 75, 77, 85, 86):
+        return "snow"
+    if code in (95, 96, 99):
+        return "storm"
+    if 51 <= code <= 82:
+        return "rain"
+    return "cloud"
+
+class LocationNotFound(ValueError):
+    """None of the configured locations could be geocoded; a config problem, not an outage."""
+
+def fetch_weather(locations, geocode_cache_path=GEOCODE_CACHE_PATH):
+    """Current weather for every location, fetched in one batched forecast request.
+
+    Returns {location: {"text", "temperature", "code"}}. Locations that can't
+    be geocoded are left out. Only ever called from the worker thread.
+    """
+    coords = geocode_all(locations, geocode_cache_path)
+    if not coords:
+        raise LocationNotFound(f"No geocoding results for {', '.join(locations)}")
+    located = list(coords)
+
+    weather_res = get_session().get(
+        FORECAST_URL,
+        params={
+            "latitude": ",".join(str(coords[location]["latitude"]) for location in located),
+            "longitude": ",".join(str(coords[location]["longitude"]) for location in located),
+            "current_weather": "true"
+        },
+        timeout=5
+    )
+    weather_res.raise_for_status()
+    weather_data = weather_res.json()
+    # Open-Meteo answers a single coordinate pair with an object and several with a list
+    if isinstance(weather_data, dict):
+        weather_data = [weather_data]
+
+    results = {}
+    for location, data in zip(located, weather_data):
+        if "current_weather" not in data:
+            continue
+        temp = data["current_weather"]["temperature"]
+        code = data["current_weather"]["weathercode"]
+        summary = weather_summary(code)
+        results[location] = {"text": f"{temp:.1f}C {summary}", "temperature": temp, "code": code}
+    return results
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_cache(cached, path=CACHE_PATH):
+    try:
+        atomic_write(path, json.dumps(cached))
+    except Exception as e:
+        print(f"Error saving weather cache: {e}")
+
+class CircuitBreaker:
+    """Tracks consecutive failures and decides when the next attempt may run.
+
+    Each failure doubles the retry delay. After enough failures in a row the
+    circuit opens and every attempt is refused until the cooldown passes,
+    after which a single trial request is let through.
+    """
+
+    def __init__(self, failures=0, retry_at=0):
+        self.failures = failures
+        self.retry_at = retry_at
+
+    @property
+    def is_open(self):
+        return self.failures >= BREAKER_THRESHOLD and time.time() < self.retry_at
+
+    def allow(self):
+        return time.time() >= self.retry_at
+
+    def reset(self):
+        self.failures = 0
+        self.retry_at = 0
+
+    def record_success(self):
+        self.reset()
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= BREAKER_THRESHOLD:
+            delay = BREAKER_COOLDOWN
+        else:
+            delay = min(RETRY_BASE * 2 ** (self.failures - 1), RETRY_MAX)
+        self.retry_at = time.time() + delay
+
+class WeatherWorker(threading.Thread):
+    """Keeps the weather for every configured location fresh in the background.
+
+    The display reads current()/entries(), which never touch the network.
+    All locations are refreshed together on one schedule, and the last good
+    values are kept until newer ones arrive (stale-while-revalidate).
+    """
+
+    def __init__(self, on_update=None, cache_path=CACHE_PATH, location_path=LOCATION_PATH, location_source=None, on_fetch=None,
+                 geocode_cache_path=GEOCODE_CACHE_PATH):
+        super().__init__(name="weather", daemon=True)
+        self.on_update = on_update
+        self.on_fetch = on_fetch  # Called with (seconds, succeeded) after every fetch attempt
+        # Optional callable returning the location.txt text, used instead of reading location_path
+        self.location_source = location_source
+        self.cache_path = cache_path
+        self.geocode_cache_path = geocode_cache_path
+        self.location_path = location_path
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        # Set once there is something to show: a cached value or the outcome of the first fetch
+        self.ready = threading.Event()
+        self._entries = {}  # location -> {"text", "temperature", "code"}
+        self._locations = ()  # Locations the entries were fetched for, in display order
+        self._timestamp = 0
+        self.breaker = CircuitBreaker()
+        self._attempted = ()  # Locations the breaker's failure count is about
+        self._unresolved = ()  # Locations that didn't geocode; not retried until they change
+
+    def load(self):
+        # Reads the cache on the worker thread so startup doesn't wait on it
+        cached = load_cache(self.cache_path)
+        entries = cached.get("locations", {})
+        if not entries and cached.get("location") and cached.get("weather"):
+            # Cache written before multiple locations were supported
+            entries = {cached["location"]: {"text": cached["weather"], "temperature": None, "code": None}}
+        with self._lock:
+            self._entries = entries
+            self._locations = tuple(entries)
+            self._timestamp = cached.get("timestamp", 0)
+        # Failures are cached too, so a restart doesn't hammer a dead network
+        self.breaker = CircuitBreaker(cached.get("failures", 0), cached.get("retry_at", 0))
+        self._attempted = tuple(cached.get("attempted", entries))
+        if entries:
+            self.ready.set()
+
+    def entries(self):
+        # [(location, {"text", "temperature", "code"}), ...] in location.txt order
+        with self._lock:
+            return [(location, self._entries[location]) for location in self._locations if location in self._entries]
+
+    def current(self):
+        # Text for the first location, or None
+        entries = self.entries()
+        return entries[0][1]["text"] if entries else None
+
+    def last_success(self):
+        # Time of the last successful fetch, 0 if there has never been one
+        with self._lock:
+            return self._timestamp
+
+    def is_stale(self):
+        with self._lock:
+            return bool(self._entries) and time.time() - self._timestamp >= CACHE_TTL
+
+    def refresh(self):
+        # Ask the worker to refetch now instead of waiting for expiry
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def _due(self, locations):
+        with self._lock:
+            if tuple(locations) != self._locations:
+                return True
+            return time.time() - self._timestamp >= CACHE_TTL - REFRESH_AHEAD
+
+    def _save(self):
+        with self._lock:
+            first = self._entries.get(self._locations[0]) if self._locations else None
+            cached = {
+                "timestamp": self._timestamp,
+                "locations": {location: self._entries[location] for location in self._locations if location in self._entries},
+                "weather": first["text"] if first else None,  # First location, for readers that only want one
+                "failures": self.breaker.failures,
+                "retry_at": self.breaker.retry_at,
+                "attempted": list(self._attempted)
+            }
+        save_cache(cached, self.cache_path)
+
+    def _update(self, locations):
+        started = time.monotonic()
+        try:
+            results = fetch_weather(locations, self.geocode_cache_path)
+            if not results:
+                raise ValueError(f"No weather found for {', '.join(locations)}")
+        except LocationNotFound as e:
+            # Retrying won't help and it isn't an outage, so the breaker is left alone
+            if self.on_fetch:
+                self.on_fetch(time.monotonic() - started, False)
+            print(f"Weather locations not found: {e}")
+            self._unresolved = tuple(locations)
+            return False
+        except Exception as e:
+            if self.on_fetch:
+                self.on_fetch(time.monotonic() - started, False)
+            self.breaker.record_failure()
+            state = "circuit open" if self.breaker.is_open else f"retry in {self.breaker.retry_at - time.time():.0f}s"
+            print(f"Weather fetch failed ({state}): {e}")
+            self._save()
+            return False
+
+        if self.on_fetch:
+            self.on_fetch(time.monotonic() - started, True)
+        self.breaker.record_success()
+        with self._lock:
+            self._entries = results
+            self._locations = tuple(locations)
+            self._timestamp = time.time()
+        self._save()
+        if self.on_update:
+            self.on_update(results)
+        return True
+
+    def run(self):
+        self.load()
+        while not self._stopping.is_set():
+            if self.location_source:
+                locations = tuple(parse_locations(self.location_source()))
+            else:
+                locations = tuple(parse_locations(get_location(self.location_path)))
+            if locations != self._attempted:
+                # Failures for the old locations (a typo, say) say nothing about the new ones
+                self._attempted = locations
+                self._unresolved = ()
+                self.breaker.reset()
+            wait = LOCATION_CHECK_INTERVAL
+            if not self.breaker.allow():
+                # Backing off after failures; manual refreshes are ignored too
+                self._wake.clear()
+                wait = self.breaker.retry_at - time.time()
+            elif locations and (self._wake.is_set() or (locations != self._unresolved and self._due(locations))):
+                self._wake.clear()
+                if self._update(locations):
+                    wait = CACHE_TTL - REFRESH_AHEAD
+                elif self._unresolved == locations:
+                    wait = LOCATION_CHECK_INTERVAL
+                else:
+                    wait = self.breaker.retry_at - time.time()
+            elif locations and locations != self._unresolved:
+                with self._lock:
+                    wait = self._timestamp + CACHE_TTL - REFRESH_AHEAD - time.time()
+            else:
+                # Nothing to fetch; check the locations again in a while, or when refresh() is called
+                self._wake.clear()
+            self.ready.set()
+            self._wake.wait(max(1, min(wait, LOCATION_CHECK_INTERVAL)))
@@ -1,17 +1,51 @@
-from flask import Flask, request, render_template, redirect, url_for, flash
+from flask import Flask, Response, request, render_template, redirect, url_for, flash, jsonify, get_flashed_messages, g
 import os
+import json
+import time
 import datetime
+import argparse
+import threading
 import subprocess
+import weather
+import lcd_service
+from jobs import JobRunner, JobError
+from config_store import CONFIG_DIR, ConfigStore, atomic_write
+from metrics import Metrics
+from marquee import parse_scroll_speed, MIN_SCROLL_SPEED, MAX_SCROLL_SPEED
+from sysinfo import NTP_CONFIG_PATH, set_command_runner, get_available_timezones, get_current_timezone, get_current_ntp_server
 
 app = Flask(__name__)
 app.static_folder = 'static'
 app.secret_key = 'os_settings_secret_key' # Required for flash messages
 
-# Paths
-MESSAGE_PATH = "/opt/piclock/msg.txt"
-COLOR_PATH = "/opt/piclock/backlight.txt"
-LOCATION_PATH = "/opt/piclock/location.txt" # Added from instructions
-NTP_CONFIG_PATH = "/etc/systemd/timesyncd.conf" # Added from instructions
+# msg.txt, backlight.txt, location.txt and scroll_speed.txt in /opt/piclock, shared with the clock process.
+# --config-dir or $PICLOCK_CONFIG_DIR move it, e.g. to run several stand-in web UIs side by side.
+store = ConfigStore(os.environ.get("PICLOCK_CONFIG_DIR", CONFIG_DIR))
+
+def use_config_dir(directory):
+    global store
+    store = ConfigStore(directory)
+
+def data_path(default):
+    # The clock's socket and caches, looked up in the configured directory
+    return store.path(os.path.basename(default))
+
+# Request and command timings for this process; the clock's own metrics are fetched from it on scrape
+metrics = Metrics(prefix="piclock_web_")
+metrics.histogram("request_seconds", "Time to produce a response, by endpoint")
+metrics.histogram("subprocess_seconds", "Duration of system commands run by the web UI")
+metrics.gauge("clock_up", "Whether the clock process answered the metrics query")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if "request_started" in g:
+        metrics.observe("request_seconds", time.perf_counter() - g.request_started,
+                        endpoint=request.endpoint or "none", method=request.method, status=response.status_code)
+    return response
 
 # Available backlight colors
 COLORS = {
@@ -25,80 +59,40 @@ COLORS = {
     "Off": (0.0, 0.0, 0.0)
 }
 
-# Timezone functions
-def get_available_timezones():
-    try:
-        # capture_output=True implies stdout=PIPE and stderr=PIPE. No need to specify stderr again.
-        result = subprocess.run(["timedatectl", "list-timezones"], capture_output=True, text=True, check=True)
-        return result.stdout.strip().split("\n")
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting available timezones: {e}. Stderr: {e.stderr.decode() if e.stderr else 'N/A'}")
-        # Flashing here might be too noisy for a GET operation, returning empty list is okay.
-        return []
-    except FileNotFoundError:
-        print("Error: timedatectl command not found. Cannot get available timezones.")
-        return []
-
-def get_current_timezone():
-    try:
-        result = subprocess.run(["timedatectl", "status"], capture_output=True, text=True, check=True)
-        for line in result.stdout.split("\n"):
-            if "Time zone:" in line:
-                return line.split(":", 1)[1].strip().split(" ")[0]
-        return "UTC" # Default if not found
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting current timezone: {e}. Stderr: {e.stderr.decode() if e.stderr else 'N/A'}")
-        return "UTC" # Default on error
-    except FileNotFoundError:
-        print("Error: timedatectl command not found. Cannot get current timezone.")
-        return "UTC"
-
-# NTP Server functions
-def get_current_ntp_server():
-    ntp_server = ""
+def apply_color(color_name):
+    # The clock process owns the LCD; ask it to apply the color instead of opening the I2C bus here
     try:
-        if os.path.exists(NTP_CONFIG_PATH):
-            with open(NTP_CONFIG_PATH, "r") as f:
-                for line in f:
-                    if line.strip().startswith("NTP="):
-                        ntp_server = line.strip().split("=", 1)[1]
-                        break
-        return ntp_server
-    except Exception as e:
-        print(f"Error reading NTP config: {e}")
-        return "" # Return empty or a default/error indicator
+        reply = lcd_service.send_command("color", path=data_path(lcd_service.SOCKET_PATH), name=color_name)
+        if not reply.get("ok"):
+            print(f"Error applying backlight: {reply.get('error')}")
+    except OSError as e:
+        print(f"Error applying backlight, is the clock running? {e}")
 
-def apply_color(color_name):
+def warm_geocode(location):
+    # Resolve the locations now so the clock only has to make the forecast call
+    locations = weather.parse_locations(location)
+    if not locations:
+        return
     try:
-        from Adafruit_CharLCD import Adafruit_CharLCDPlate
-        lcd = Adafruit_CharLCDPlate()
-        rgb = COLORS.get(color_name, (1.0, 1.0, 1.0))
-        lcd.set_color(*rgb)
-        lcd.clear()
-        lcd.message(f"Backlight:\n{color_name}")
+        found = weather.geocode_all(locations, data_path(weather.GEOCODE_CACHE_PATH))
     except Exception as e:
-        print(f"Error applying backlight: {e}")
+        print(f"Error resolving location: {e}")
+        flash("Location saved, but it could not be looked up yet. The clock will retry.", "info")
+        return
+    for name in locations:
+        if name not in found:
+            flash(f"Location '{name}' could not be found for weather.", "error")
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     # Load current values & OS data
     current_time = datetime.datetime.now().strftime("%H:%M:%S")
-    # message = request.args.get("message", "") # This will be replaced by flashed messages
-
-    current_msg = ""
-    if os.path.exists(MESSAGE_PATH):
-        with open(MESSAGE_PATH, "r") as f:
-            current_msg = f.read().strip()
-
-    selected_color = "White"
-    if os.path.exists(COLOR_PATH):
-        with open(COLOR_PATH, "r") as f:
-            selected_color = f.read().strip()
 
-    current_location = ""
-    if os.path.exists(LOCATION_PATH):
-        with open(LOCATION_PATH, "r") as f:
-            current_location = f.read().strip()
+    config = store.snapshot()
+    current_msg = config["msg.txt"] or ""
+    selected_color = config["backlight.txt"] or "White"
+    current_location = config["location.txt"] or ""
+    scroll_speed = parse_scroll_speed(config["scroll_speed.txt"])
 
     available_timezones = get_available_timezones()
     current_timezone = get_current_timezone()
@@ -108,76 +102,52 @@ def index():
     if request.method == "POST":
         action_taken = False # Flag to see if any POST action was handled by this route
         if "clear" in request.form:
-            if os.path.exists(MESSAGE_PATH):
+            if current_msg:
                 try:
-                    os.remove(MESSAGE_PATH)
-                    current_msg = ""
+                    store.write("msg.txt", None)
                     flash("Message cleared successfully.", "success")
                 except OSError as e:
                     flash(f"Error clearing message: {e}", "error")
             else:
                 flash("No message to clear.", "info")
             action_taken = True # Still consider it an action
-        elif "message" in request.form:
-            msg_to_set = request.form.get("message", "").strip()
+        elif "message" in request.form or "location" in request.form or "scroll_speed" in request.form:
+            # Message, location and scroll speed share a form, so they are saved together
+            new_location = "\n".join(weather.parse_locations(request.form.get("location", current_location)))
             try:
-                import tempfile
-                tmp_path = None
-                os.makedirs(os.path.dirname(MESSAGE_PATH), exist_ok=True) # Ensure dir exists for sudo cp
-                with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmpfile:
-                    tmp_path = tmpfile.name
-                    tmpfile.write(msg_to_set)
-                subprocess.run(["sudo", "cp", tmp_path, MESSAGE_PATH], check=True)
-                current_msg = msg_to_set
-                flash("Message updated successfully.", "success")
-            except (IOError, subprocess.CalledProcessError, FileNotFoundError) as e:
-                flash(f"Error updating message: {e}", "error")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
+                with store.transaction() as changes:
+                    if "message" in request.form:
+                        changes["msg.txt"] = request.form.get("message", "").strip()
+                    if new_location != current_location:
+                        changes["location.txt"] = new_location
+                    if "scroll_speed" in request.form:
+                        changes["scroll_speed.txt"] = str(parse_scroll_speed(request.form["scroll_speed"]))
+                flash("Display and location updated successfully.", "success")
+                if new_location != current_location:
+                    warm_geocode(new_location)
+            except OSError as e:
+                flash(f"Error updating display settings: {e}", "error")
             action_taken = True
         elif "color" in request.form:
             color_name = request.form.get("color")
             if color_name in COLORS:
                 try:
-                    import tempfile
-                    tmp_path = None
-                    os.makedirs(os.path.dirname(COLOR_PATH), exist_ok=True)
-                    with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmpfile:
-                        tmp_path = tmpfile.name
-                        tmpfile.write(color_name)
-                    subprocess.run(["sudo", "cp", tmp_path, COLOR_PATH], check=True)
-                    apply_color(color_name) 
-                    selected_color = color_name
+                    store.write("backlight.txt", color_name)
+                    apply_color(color_name)
                     flash(f"Backlight color set to {color_name}.", "success")
-                except (IOError, subprocess.CalledProcessError, FileNotFoundError) as e:
+                except OSError as e:
                     flash(f"Error setting backlight color: {e}", "error")
-                finally:
-                    if tmp_path and os.path.exists(tmp_path):
-                        os.remove(tmp_path)
             else:
                 flash(f"Invalid color selected: {color_name}", "error")
             action_taken = True
-        elif "location" in request.form:
-            new_location = request.form.get("location", "").strip()
-            try:
-                import tempfile
-                tmp_path = None
-                os.makedirs(os.path.dirname(LOCATION_PATH), exist_ok=True)
-                with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmpfile:
-                    tmp_path = tmpfile.name
-                    tmpfile.write(new_location)
-                subprocess.run(["sudo", "cp", tmp_path, LOCATION_PATH], check=True)
-                current_location = new_location
-                flash("Location updated successfully.", "success")
-            except (IOError, subprocess.CalledProcessError, FileNotFoundError) as e:
-                flash(f"Error updating location: {e}", "error")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-            action_taken = True
-        
+
         if action_taken:
+            notify_status_changed()
+            if wants_json():
+                # Scripted clients (e.g. fleet.py) get the outcome directly instead of a redirect
+                messages = get_flashed_messages(with_categories=True)
+                ok = all(category != "error" for category, _ in messages)
+                return jsonify({"ok": ok, "messages": [message for _, message in messages]}), 200 if ok else 400
             # Instead of passing message via render_template, rely on flashed messages
             # and redirect to show them cleanly after a POST.
             return redirect(url_for('index'))
@@ -188,114 +158,291 @@ def index():
                            current_msg=current_msg,
                            colors=COLORS.keys(),
                            selected_color=selected_color,
-                           # message=message, # Removed, using flash
                            current_location=current_location,
+                           scroll_speed=scroll_speed,
+                           min_scroll_speed=MIN_SCROLL_SPEED,
+                           max_scroll_speed=MAX_SCROLL_SPEED,
                            available_timezones=available_timezones,
                            current_timezone=current_timezone,
-                           current_ntp_server=current_ntp_server)
+                           current_ntp_server=current_ntp_server,
+                           recent_jobs=jobs.recent())
+
+# Slow privileged operations run in the background so requests return immediately
+jobs = JobRunner()
+
+def command_error(e):
+    return e.stderr.strip() if e.stderr else str(e)
+
+def run_command(args):
+    # subprocess.run with the duration recorded, labelled without the sudo prefix
+    name = " ".join(args[1:3] if args[0] == "sudo" else args[:2])
+    started = time.perf_counter()
+    status = "error"
+    try:
+        result = subprocess.run(args, check=True, capture_output=True, text=True)
+        status = "ok"
+        return result
+    finally:
+        metrics.observe("subprocess_seconds", time.perf_counter() - started, command=name, status=status)
+
+# The timedatectl lookups behind page loads are timed too
+set_command_runner(run_command)
+
+def set_timezone_job(job, new_timezone):
+    job.report("Setting timezone")
+    try:
+        run_command(["sudo", "timedatectl", "set-timezone", new_timezone])
+    except subprocess.CalledProcessError as e:
+        raise JobError(f"Error setting timezone: {command_error(e)}")
+    except FileNotFoundError:
+        raise JobError("Error: timedatectl command not found. Cannot set timezone.")
+    notify_status_changed()
+    return f"Timezone successfully set to {new_timezone}."
+
+def set_ntp_server_job(job, new_ntp_server):
+    job.report("Updating NTP configuration")
+    original_content = ""
+    if os.path.exists(NTP_CONFIG_PATH):
+        with open(NTP_CONFIG_PATH, "r") as f_read:
+            original_content = f_read.read()
+
+    lines = original_content.splitlines()
+    new_lines = []
+    ntp_line_found = False
+    for line in lines:
+        stripped_line = line.strip()
+        if stripped_line.startswith("NTP="):
+            if new_ntp_server:
+                new_lines.append(f"NTP={new_ntp_server}")
+            else:
+                new_lines.append(f"#{stripped_line}") # Comment out existing if new is empty
+            ntp_line_found = True
+        elif stripped_line.startswith("#NTP=") and new_ntp_server:
+            new_lines.append(f"NTP={new_ntp_server}") # Replace commented line
+            ntp_line_found = True
+        else:
+            new_lines.append(line) # Keep other lines as is
+
+    if not ntp_line_found and new_ntp_server: # If no NTP line existed and new server is provided
+        new_lines.append(f"NTP={new_ntp_server}")
+
+    try:
+        atomic_write(NTP_CONFIG_PATH, "".join(line + "\n" for line in new_lines))
+        job.report("Restarting systemd-timesyncd")
+        run_command(["sudo", "systemctl", "restart", "systemd-timesyncd"])
+    except subprocess.CalledProcessError as e:
+        # The new config is already in place if only the restart failed
+        raise JobError(f"Error restarting systemd-timesyncd: {command_error(e)}")
+    except FileNotFoundError:
+        raise JobError("Error: systemctl command not found.")
+    except OSError as e:
+        raise JobError(f"Error writing NTP config: {e}")
+    return "NTP server configuration updated and service restarted."
+
+def sync_ntp_job(job):
+    try:
+        job.report("Enabling NTP")
+        run_command(["sudo", "timedatectl", "set-ntp", "true"])
+        # Restart the service to force sync
+        job.report("Restarting systemd-timesyncd")
+        run_command(["sudo", "systemctl", "restart", "systemd-timesyncd"])
+    except subprocess.CalledProcessError as e:
+        raise JobError(f"Error during NTP sync: {command_error(e)}")
+    except FileNotFoundError:
+        raise JobError("Error: timedatectl, systemctl or timesyncd command not found.")
+    return "NTP synchronization initiated with systemd-timesyncd."
+
+def wants_json():
+    return request.accept_mimetypes.best == "application/json"
+
+def job_submitted(job, description):
+    # API clients get the job ID back; browsers get a flash and the usual redirect
+    if wants_json():
+        return jsonify(job.to_dict()), 202
+    flash(f"{description} queued (job {job.id}).", "info")
+    return redirect(url_for("index"))
 
 @app.route("/set_timezone", methods=["POST"])
 def set_timezone_route():
     if "timezone" in request.form:
         new_timezone = request.form["timezone"]
-        try:
-            # Capture stderr for more detailed error reporting
-            result = subprocess.run(["sudo", "timedatectl", "set-timezone", new_timezone], check=True, capture_output=True, text=True) # capture_output implies stderr capture
-            flash(f"Timezone successfully set to {new_timezone}.", "success")
-        except subprocess.CalledProcessError as e:
-            error_output = e.stderr.decode().strip() if e.stderr else str(e)
-            flash(f"Error setting timezone: {error_output}", "error")
-        except FileNotFoundError:
-            flash("Error: timedatectl command not found. Cannot set timezone.", "error")
-    else:
-        flash("No timezone provided.", "error")
+        job = jobs.submit("timezone", "Set timezone", set_timezone_job, new_timezone)
+        return job_submitted(job, f"Timezone change to {new_timezone}")
+    if wants_json():
+        return jsonify({"error": "No timezone provided."}), 400
+    flash("No timezone provided.", "error")
     return redirect(url_for("index"))
 
 @app.route("/set_ntp_server", methods=["POST"])
 def set_ntp_server_route():
     if "ntp_server" in request.form:
         new_ntp_server = request.form["ntp_server"].strip()
-        original_content = ""
-        
-        # The main logic for processing NTP server update is within this try block
-        try:
-            if os.path.exists(NTP_CONFIG_PATH):
-                with open(NTP_CONFIG_PATH, "r") as f_read:
-                    original_content = f_read.read()
-            
-            lines = original_content.splitlines()
-            new_lines = []
-            ntp_line_found = False
-            for line in lines:
-                stripped_line = line.strip()
-                if stripped_line.startswith("NTP="):
-                    if new_ntp_server:
-                        new_lines.append(f"NTP={new_ntp_server}")
-                    else:
-                        new_lines.append(f"#{stripped_line}") # Comment out existing if new is empty
-                    ntp_line_found = True
-                elif stripped_line.startswith("#NTP=") and new_ntp_server:
-                    new_lines.append(f"NTP={new_ntp_server}") # Replace commented line
-                    ntp_line_found = True
-                else:
-                    new_lines.append(line) # Keep other lines as is
-            
-            if not ntp_line_found and new_ntp_server: # If no NTP line existed and new server is provided
-                new_lines.append(f"NTP={new_ntp_server}")
-
-            # Write to a temporary file first
-            import tempfile
-            tmp_path = None # Initialize tmp_path to ensure it's always defined for finally block
-            try:
-                with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmpfile:
-                    tmp_path = tmpfile.name
-                    for line_to_write in new_lines:
-                        tmpfile.write(line_to_write + "\\n")
-                
-                # Use sudo to copy the temporary file to the actual config path
-                cp_result = subprocess.run(["sudo", "cp", tmp_path, NTP_CONFIG_PATH], check=True, capture_output=True, text=True)
-                
-                # Restart timesyncd
-                subprocess.run(["sudo", "systemctl", "restart", "systemd-timesyncd"], check=True, capture_output=True, text=True)
-                flash("NTP server configuration updated and service restarted.", "success")
-
-            except subprocess.CalledProcessError as e:
-                # This could be from `sudo cp` or `sudo systemctl restart`
-                error_message = e.stderr.decode().strip() if e.stderr else str(e)
-                flash(f"Error during NTP configuration or service restart: {error_message}", "error")
-                # If cp succeeded but restart failed, config is changed. If cp failed, it's not.
-                # The "restore original content" logic might be complex here if cp failed.
-                # For now, we assume if cp fails, original is intact. If restart fails, new config is there.
-                # The previous logic of restoring original_content on restart failure is good, but needs sudo for write.
-                # For simplicity here, if restart fails, we'll just report it. A more robust solution might try to sudo cp the original_content back.
-            except IOError as e: # Error writing to temporary file
-                flash(f"Error writing temporary NTP config: {e}", "error")
-            except FileNotFoundError: # systemctl or cp not found
-                flash("Error: Required system command (cp or systemctl) not found.", "error")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path) # Clean up temporary file
-        except Exception as e: # Generic except for the outer try block
-            flash(f"An unexpected error occurred during NTP server configuration: {e}", "error")
-            print(f"Error in set_ntp_server_route: {e}") # Log for server-side debugging
-    else: # This is the else for: 'if "ntp_server" in request.form:'
-        flash("No NTP server provided.", "error")
+        job = jobs.submit("ntp_server", "Set NTP server", set_ntp_server_job, new_ntp_server)
+        return job_submitted(job, "NTP server update")
+    if wants_json():
+        return jsonify({"error": "No NTP server provided."}), 400
+    flash("No NTP server provided.", "error")
     return redirect(url_for("index"))
 
 @app.route("/sync_ntp", methods=["POST"])
 def sync_ntp_route():
+    job = jobs.submit("sync_ntp", "Sync NTP", sync_ntp_job)
+    return job_submitted(job, "NTP sync")
+
+@app.route("/jobs/<job_id>")
+def job_status_route(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+# Status API
+SSE_CHECK_INTERVAL = 1  # How often event streams look for changes made by other processes
+SSE_KEEPALIVE = 5  # Also how long a stream whose client has gone away can keep its slot
+MAX_EVENT_STREAMS = 3  # Each open stream holds a server thread; serve() allows workers - 1
+
+_event_streams = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+
+def set_max_event_streams(count):
+    # Call before serving; streams already open release the semaphore they took
+    global _event_streams
+    _event_streams = threading.BoundedSemaphore(count)
+
+# Notified when this process changes something, so event streams don't wait for their next check
+status_changed = threading.Condition()
+
+def notify_status_changed():
+    with status_changed:
+        status_changed.notify_all()
+
+_weather_updated = (None, 0)  # (cache file mtime, timestamp of the last successful fetch in it)
+
+def weather_updated():
+    # The weather cache is also rewritten after failed fetches to record the backoff, so
+    # its mtime changes while the weather doesn't. The file is only re-read when it changes.
+    global _weather_updated
+    path = data_path(weather.CACHE_PATH)
     try:
-        # Enable NTP
-        result_enable_ntp = subprocess.run(["sudo", "timedatectl", "set-ntp", "true"], check=True, capture_output=True, text=True) # capture_output implies stderr capture
-        # Restart the service to force sync
-        result_restart = subprocess.run(["sudo", "systemctl", "restart", "systemd-timesyncd"], check=True, capture_output=True, text=True) # capture_output implies stderr capture
-        flash("NTP synchronization initiated with systemd-timesyncd.", "success")
-    except subprocess.CalledProcessError as e:
-        error_output = e.stderr.decode().strip() if e.stderr else str(e)
-        flash(f"Error during NTP sync: {error_output}", "error")
-    except FileNotFoundError:
-        flash("Error: timedatectl, systemctl or timesyncd command not found.", "error")
-    return redirect(url_for("index"))
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+    if _weather_updated[0] != mtime:
+        _weather_updated = (mtime, weather.load_cache(path).get("timestamp", 0))
+    return _weather_updated[1]
+
+def status_etag():
+    # Cheap to compute: two small file reads, one stat and a cached symlink lookup
+    return f"{store.version()}-{weather_updated()}-{get_current_timezone()}"
+
+def build_status():
+    config = store.snapshot()
+    cached = weather.load_cache(data_path(weather.CACHE_PATH))
+    return {
+        "message": config["msg.txt"] or "",
+        "color": config["backlight.txt"] or "White",
+        "location": config["location.txt"] or "",
+        "scroll_speed": parse_scroll_speed(config["scroll_speed.txt"]),
+        "weather": {
+            "text": cached.get("weather"),
+            "updated": cached.get("timestamp") or None
+        },
+        "locations": [
+            {"location": location, "weather": entry.get("text")}
+            for location, entry in cached.get("locations", {}).items()
+        ],
+        "timezone": get_current_timezone(),
+        "version": store.version()
+    }
+
+@app.route("/api/status")
+def api_status_route():
+    etag = status_etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_status())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route("/api/events")
+def api_events_route():
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if request.method == "HEAD":
+        # No body is sent, so there is no stream to hold a slot for
+        return Response(mimetype="text/event-stream", headers=headers)
+
+    # Streams are capped so they can't take every worker thread away from normal requests
+    streams = _event_streams
+    if not streams.acquire(blocking=False):
+        return jsonify({"error": "Too many event streams"}), 503
+
+    # waitress can tell us when the client hangs up (with channel_request_lookahead set),
+    # so the slot comes back within a check interval instead of at the next failed write
+    client_gone = request.environ.get("waitress.client_disconnected", lambda: False)
+
+    def stream():
+        last_etag = None
+        last_sent = 0
+        while not client_gone():
+            etag = status_etag()
+            if etag != last_etag:
+                last_etag = etag
+                last_sent = time.time()
+                yield f"event: status\nid: {etag}\ndata: {json.dumps(build_status())}\n\n"
+            elif time.time() - last_sent >= SSE_KEEPALIVE:
+                last_sent = time.time()
+                yield ": keepalive\n\n"
+            with status_changed:
+                status_changed.wait(SSE_CHECK_INTERVAL)
+
+    response = Response(stream(), mimetype="text/event-stream", headers=headers)
+    # Released when the server closes the response, which also happens for clients
+    # that go away before the first event, where the generator never runs
+    response.call_on_close(streams.release)
+    return response
+
+@app.route("/metrics")
+def metrics_route():
+    # The clock answers on its socket thread, so scraping never waits on the render loop
+    try:
+        reply = lcd_service.send_command("metrics", path=data_path(lcd_service.SOCKET_PATH))
+        clock_metrics = reply.get("result") or ""
+    except (OSError, ValueError) as e:
+        print(f"Error reading clock metrics, is the clock running? {e}")
+        clock_metrics = ""
+    metrics.set("clock_up", 1 if clock_metrics else 0)
+    return Response(metrics.render() + clock_metrics, mimetype="text/plain; version=0.0.4")
+
+def serve(host="0.0.0.0", port=8080, workers=4, timeout=30, dev=False):
+    if not dev:
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            print("waitress is not installed, falling back to the Flask development server")
+            dev = True
+    if dev:
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    # Leave one worker free for normal requests however many streams are open
+    set_max_event_streams(max(1, workers - 1))
+    # channel_timeout closes keep-alive connections that sit idle, and requests that stall
+    print(f"Serving on http://{host}:{port} with {workers} worker threads")
+    waitress_serve(app, host=host, port=port, threads=workers,
+                   channel_timeout=timeout, connection_limit=workers * 16,
+                   channel_request_lookahead=1,
+                   ident="PiClock")
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080)
+    parser = argparse.ArgumentParser(description="PiClock web control")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads handling requests")
+    parser.add_argument("--timeout", type=int, default=30, help="Seconds before an idle or stalled connection is closed")
+    parser.add_argument("--dev", action="store_true", help="Use the Flask development server")
+    parser.add_argument("--config-dir", help=f"Directory shared with the clock (default {CONFIG_DIR}); also read from $PICLOCK_CONFIG_DIR")
+    args = parser.parse_args()
+    if args.config_dir:
+        use_config_dir(args.config_dir)
+    serve(args.host, args.port, args.workers, args.timeout, args.dev)